@@ -47,6 +47,10 @@ function! ensime#au_vim_enter(filename) abort
     return s:call_plugin('au_vim_enter', [a:filename])
 endfunction
 
+function! ensime#au_buf_enter(filename) abort
+    return s:call_plugin('au_buf_enter', [a:filename])
+endfunction
+
 function! ensime#au_buf_leave(filename) abort
     return s:call_plugin('au_buf_leave', [a:filename])
 endfunction
@@ -59,6 +63,10 @@ function! ensime#au_cursor_moved(filename) abort
     return s:call_plugin('au_cursor_moved', [a:filename])
 endfunction
 
+function! ensime#au_text_changed(filename) abort
+    return s:call_plugin('au_text_changed', [a:filename])
+endfunction
+
 function! ensime#com_en_no_teardown(args, range) abort
     return s:call_plugin('com_en_no_teardown', [a:args, a:range])
 endfunction
@@ -67,6 +75,18 @@ function! ensime#com_en_type_check(args, range) abort
     return s:call_plugin('com_en_type_check', [a:args, a:range])
 endfunction
 
+function! ensime#com_en_diagnostics(args, range) abort
+    return s:call_plugin('com_en_diagnostics', [a:args, a:range])
+endfunction
+
+function! ensime#com_en_server_stats(args, range) abort
+    return s:call_plugin('com_en_server_stats', [a:args, a:range])
+endfunction
+
+function! ensime#com_en_startup_profile(args, range) abort
+    return s:call_plugin('com_en_startup_profile', [a:args, a:range])
+endfunction
+
 function! ensime#com_en_type(args, range) abort
     return s:call_plugin('com_en_type', [a:args, a:range])
 endfunction
@@ -0,0 +1,212 @@
+# coding: utf-8
+
+"""
+Caches of buffer contents and derived data, so that hot paths like completion
+don't have to copy whole buffers over the editor's RPC each time.
+"""
+
+import hashlib
+import os
+from bisect import bisect_right
+
+
+class LineIndex(object):
+    """Converts between ``(row, col)`` positions and offsets in a buffer.
+
+    Keeps prefix sums of line lengths, counting one character for each line
+    break. Lines are fetched from the buffer lazily, only as far as a lookup
+    needs, and the sums are reused by later lookups. The index is only valid
+    for the buffer content at ``changedtick``.
+
+    Args:
+        fetch (Callable[[int, Optional[int]], List[str]]):
+            Returns a slice of the buffer's lines, like ``buffer[start:end]``.
+        changedtick (int): Value of ``b:changedtick`` the index is built for.
+    """
+
+    def __init__(self, fetch, changedtick):
+        self.changedtick = changedtick
+        self._fetch = fetch
+        self._starts = [0]  # Offset of the first character of each line
+        self._complete = False
+
+    def offset(self, row, col):
+        """Offset of a position, for a 1-based ``row`` and 0-based ``col``."""
+        self._extend(row - 1)
+        return self._starts[min(row - 1, len(self._starts) - 1)] + col
+
+    def position(self, offset):
+        """Position of an offset, as a 1-based row and 0-based column.
+
+        Offsets past the end of the buffer resolve to a column on the last line.
+        """
+        if self._starts[-1] <= offset:
+            self._extend(None)
+        i = max(bisect_right(self._starts, offset) - 1, 0)
+        if self._complete and i == len(self._starts) - 1 and i > 0:
+            i -= 1  # The last entry is the end of the buffer, not a line
+        return i + 1, offset - self._starts[i]
+
+    def _extend(self, nlines):
+        """Make sure sums for the first ``nlines`` lines are known, or all."""
+        known = len(self._starts) - 1
+        if self._complete or (nlines is not None and nlines <= known):
+            return
+
+        lines = self._fetch(known, nlines)
+        for line in lines:
+            self._starts.append(self._starts[-1] + len(line) + 1)
+        if nlines is None or len(lines) < nlines - known:
+            self._complete = True
+
+
+class BufferSnapshot(object):
+    """Contents of a buffer at a given ``b:changedtick``.
+
+    The joined text, its encoding and digest are computed at most once, so
+    repeated requests against an unchanged buffer cost nothing more.
+
+    Args:
+        lines (List[str]): Lines of the buffer.
+        changedtick (int): Value of ``b:changedtick`` for these lines.
+    """
+
+    def __init__(self, lines, changedtick):
+        self.lines = lines
+        self.changedtick = changedtick
+        self._text = None
+        self._encoded = None
+        self._digest = None
+
+    @property
+    def text(self):
+        """str: The contents, as lines joined by line breaks."""
+        if self._text is None:
+            self._text = "\n".join(self.lines)
+        return self._text
+
+    @property
+    def encoded(self):
+        """bytes: The contents encoded as UTF-8."""
+        if self._encoded is None:
+            text = self.text
+            self._encoded = text if isinstance(text, bytes) else text.encode('utf-8')
+        return self._encoded
+
+    @property
+    def digest(self):
+        """str: Hex SHA-1 digest of the contents as they'd be written to a
+        file, i.e. with a line break ending the last line.
+        """
+        if self._digest is None:
+            self._digest = hashlib.sha1(self.encoded + b'\n').hexdigest()
+        return self._digest
+
+
+class DiskDigests(object):
+    """Digests of files on disk, recomputed only when a file's stat changes."""
+
+    def __init__(self):
+        self._digests = {}  # path -> (mtime, size, digest)
+
+    def get(self, path):
+        """Digest of the file at ``path``, or ``None`` if it can't be read."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+
+        cached = self._digests.get(path)
+        if cached and cached[:2] == (st.st_mtime, st.st_size):
+            return cached[2]
+
+        try:
+            with open(path, 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+        except (IOError, OSError):
+            return None
+        self._digests[path] = (st.st_mtime, st.st_size, digest)
+        return digest
+
+
+class BufferMirror(object):
+    """Local copy of a Neovim buffer's lines, kept up to date by the line
+    events of ``nvim_buf_attach``.
+
+    Lines are replaced rather than edited in place, so snapshots and indexes
+    handed out earlier never see later changes.
+    """
+
+    def __init__(self):
+        self.lines = None  # Until the initial contents arrive
+        self.version = 0  # Bumped on every change
+        self._snapshot = None
+        self._index = None
+
+    @property
+    def ready(self):
+        """bool: Whether the mirror has received the buffer's contents."""
+        return self.lines is not None
+
+    def update(self, firstline, lastline, linedata):
+        """Apply a ``nvim_buf_lines_event``.
+
+        Args:
+            firstline (int): First line replaced, 0-based.
+            lastline (int): Line after the last line replaced, -1 for all.
+            linedata (List[str]): Lines replacing them.
+        """
+        if lastline == -1 or self.lines is None:
+            self.lines = list(linedata)
+        else:
+            self.lines = self.lines[:firstline] + list(linedata) + self.lines[lastline:]
+        self.version += 1
+
+    def snapshot(self):
+        """:class:`BufferSnapshot` of the current contents, with ``changedtick``
+        being the mirror's version."""
+        if self._snapshot is None or self._snapshot.changedtick != self.version:
+            self._snapshot = BufferSnapshot(self.lines, self.version)
+        return self._snapshot
+
+    def line_index(self):
+        """:class:`LineIndex` of the current contents."""
+        if self._index is None or self._index.changedtick != self.version:
+            lines = self.lines
+            self._index = LineIndex(lambda start, end: lines[start:end], self.version)
+        return self._index
+
+
+class BufferMirrors(object):
+    """The :class:`BufferMirror` of each Neovim buffer attached to.
+
+    Neovim sends buffer events to the channel that attached, so one set of
+    mirrors serves all clients of the plugin.
+    """
+
+    def __init__(self):
+        self._mirrors = {}  # Buffer number -> BufferMirror
+
+    def attach(self, buf):
+        """Start mirroring a buffer, unless it already is.
+
+        Args:
+            buf: A Neovim ``Buffer``.
+        """
+        if buf.number not in self._mirrors and buf.api.attach(True, {}):
+            self._mirrors[buf.number] = BufferMirror()
+
+    def get(self, bufnr):
+        """Mirror of a buffer, or ``None`` if it's not mirrored (yet)."""
+        mirror = self._mirrors.get(bufnr)
+        return mirror if mirror and mirror.ready else None
+
+    def on_lines(self, bufnr, firstline, lastline, linedata):
+        """Handles ``nvim_buf_lines_event``."""
+        mirror = self._mirrors.get(bufnr)
+        if mirror:
+            mirror.update(firstline, lastline, linedata)
+
+    def on_detach(self, bufnr):
+        """Handles ``nvim_buf_detach_event``, e.g. when a buffer is unloaded."""
+        self._mirrors.pop(bufnr, None)
@@ -4,25 +4,39 @@ import inspect
 import json
 import logging
 import os
+import re
 import shutil
 import sys
 import tempfile
 import time
+from collections import deque
 from subprocess import PIPE, Popen
-from threading import Thread
 
+from .buffers import DiskDigests
+from .completion import CompletionSession
 from .config import feedback, gconfig, LOG_FORMAT
 from .debugger import DebuggerClient
+from .diagnostics import NotesCache
 from .errors import InvalidJavaPathError
+from .pending import Generations, PendingCalls
 from .protocol import ProtocolHandler, ProtocolHandlerV1, ProtocolHandlerV2
+from .receiver import WebsocketReceiver
+from .startup import describe
+from .supervisor import Supervisor
+from .symbol_format import completion_to_suggest
+from .transport import asyncio_available
 from .typecheck import TypecheckHandler
 from .util import catch, module_exists, Pretty, Util
+from .watcher import ReadinessWatcher
 
 # Queue depends on python version
 if sys.version_info > (3, 0):
-    from queue import Queue
+    from queue import Empty, Queue
 else:
-    from Queue import Queue
+    from Queue import Empty, Queue
+
+# Cheap look at the callId of a response, without decoding all of it
+CALL_ID_PREFIX = re.compile(r'\{\s*"callId"\s*:\s*(\d+)')
 
 
 class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
@@ -36,19 +50,45 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
     ENSIME server or launch a new one with a call to the ``setup()`` method.
 
     Communication with the server is done over a websocket (`self.ws`). Messages
-    are sent to the server in the calling thread, while messages are received on
-    a separate background thread and enqueued in `self.queue` upon receipt.
+    are sent to the server in the calling thread, while messages are received by
+    a background :class:`WebsocketReceiver` and enqueued in `self.queue` upon
+    receipt.
 
     Each call to the server contains a `callId` field with an integer ID,
     generated from `self.call_id`. Responses echo back the `callId` field so
-    that appropriate handlers can be invoked.
+    that appropriate handlers can be invoked. Callers that need a response
+    synchronously register the call in `self.pending` with
+    :meth:`expect_response`, and its response is handed straight to them by
+    :meth:`wait_for_response` instead of going through the queue.
 
     Responses also contain a `typehint` field in their `payload` field, which
     contains the type of the response. This is used to key into `self.handlers`,
     which stores the a handler per response type.
+
+    By default the websocket is a blocking ``websocket-client`` connection.
+    With ``transport='asyncio'`` it is instead driven by the process-wide
+    :class:`~ensime_shared.transport.AsyncioEngine`, if available.
+
+    Clients of the same editor session should share one ``receiver``, so a
+    single thread waits on all of their websockets. If none is given, the
+    client starts and owns its own.
+
+    Responses to interactive requests (see `supersedable`) are dropped if a
+    newer request of the same kind was sent in the meantime.
     """
 
-    def __init__(self, editor, vim, launcher):  # noqa: C901 FIXME
+    supersedable = frozenset([
+        "CompletionsReq",
+        "DocUriAtPointReq",
+        "ImportSuggestionsReq",
+        "InspectTypeAtPointReq",
+        "SymbolAtPointReq",
+        "TypeAtPointReq",
+    ])
+    """Typehints of requests whose older, unanswered calls go stale."""
+
+    def __init__(self, editor, vim, launcher, transport='thread',  # noqa: C901 FIXME
+                 receiver=None):
         # Our use case of a logger per class instance with independent log files
         # requires a bunch of manual programmatic config :-/
         def setup_logger():
@@ -109,6 +149,11 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         self.ws = None
         self.ensime = None
         self.ensime_server = None
+        # Tells when the launched server can be connected to
+        self.ready_watcher = None
+        self.server_ready = False
+        # Launches the server again if it dies
+        self.supervisor = None
 
         self.call_id = 0
         self.call_options = {}
@@ -118,10 +163,23 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
 
         # Queue for messages received from the ensime server.
         self.queue = Queue()
+        # Requests with a caller blocked waiting on the response
+        self.pending = PendingCalls()
+        self.generations = Generations(self.supersedable)
         self.suggestions = None
         self.completion_timeout = 10  # seconds
-        self.completion_started = False
+        # Many candidates are fetched and ranked locally, fewer are shown
+        self.completion_max_results = 2000
+        self.completion_max_suggestions = 100
+        self.completion_call_id = None
+        # Completions for the identifier being typed, see complete_func
+        self.completion_session = None
+        self.completion_prefix = None
         self.en_format_source_id = None
+        # Lets us leave out buffer contents the server can read from disk
+        self.disk_digests = DiskDigests()
+        self.notes_cache = NotesCache(
+            os.path.join(self.launcher.config['cache-dir'], 'ensime-vim-notes.json'))
 
         self.full_types_enabled = False
         """Whether fully-qualified types are displayed by inspections or not"""
@@ -141,45 +199,119 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         self.debug_thread_id = None
         self.running = True
 
-        thread = Thread(name='queue-poller', target=self.queue_poll)
-        thread.daemon = True
-        thread.start()
+        # Delivers messages to the queue as soon as they arrive
+        self._owns_receiver = receiver is None
+        self.receiver = receiver or WebsocketReceiver(self.log)
+        # Thread-safe scheduling on the editor's main thread, see enable_push
+        self.schedule = None
+        self._push_scheduled = False
+        # Callbacks for the main thread if there's no schedule, see call_soon
+        self.callbacks = deque()
+        # Server install running in the background, see install_server
+        self.bootstrap = None
+
+        self.engine = None
+        if transport == 'asyncio':
+            if asyncio_available():
+                from .transport import AsyncioEngine
+                self.engine = AsyncioEngine.shared()
+            elif sys.version_info > (3, 0):
+                self.tell_module_missing("websockets")
+            else:
+                self.editor.message('asyncio_needs_python3')
 
-        self.websocket_exists = module_exists("websocket")
+        self.websocket_exists = self.engine is not None or module_exists("websocket")
         if not self.websocket_exists:
             self.tell_module_missing("websocket-client")
         if not module_exists("sexpdata"):
             self.tell_module_missing("sexpdata")
 
-    def queue_poll(self, sleep_t=0.5):
-        """Put new messages on the queue as they arrive. Blocking in a thread.
+    def on_message(self, message):
+        """Route a message from the server, called from the receiver thread.
 
-        Value of sleep is low to improve responsiveness.
+        Responses awaited by :meth:`wait_for_response` resolve their pending
+        call, everything else is enqueued to be dispatched by :meth:`unqueue`.
         """
-        connection_alive = True
+        self.log.debug('on_message: received\n%s', message)
+        if not message or message == "nil":
+            self.log.debug('on_message: nil or None received')
+            return
 
-        while self.running:
-            if self.ws:
-                def logger_and_close(msg):
-                    self.log.error('Websocket exception', exc_info=True)
-                    if not self.running:
-                        # Tear down has been invoked
-                        # Prepare to exit the program
-                        connection_alive = False  # noqa: F841
-                    else:
-                        if not self.number_try_connection:
-                            # Stop everything and disable plugin
-                            self.teardown()
-                            self.disable_plugin()
-
-                # WebSocket exception may happen
-                # FIXME: What Exception class? Don't catch Exception
-                with catch(Exception, logger_and_close):
-                    result = self.ws.recv()
-                    self.queue.put(result)
-
-            if connection_alive:
-                time.sleep(sleep_t)
+        sniffed = CALL_ID_PREFIX.match(message)
+        if sniffed and self.is_stale(int(sniffed.group(1))):
+            return
+
+        try:
+            _json = json.loads(message)
+        except ValueError:
+            self.log.error('on_message: invalid JSON received: %s', message)
+            return
+
+        # Watch out, it may not have callId
+        call_id = _json.get("callId")
+        if not sniffed and call_id is not None and self.is_stale(call_id):
+            return
+
+        if not self.pending.resolve(call_id, _json):
+            self.queue.put(_json)
+            if self.schedule and not self._push_scheduled:
+                self._push_scheduled = True
+                self.schedule(self._unqueue_pushed)
+
+    def is_stale(self, call_id):
+        """Whether the response to ``call_id`` was superseded, forgetting the call."""
+        if self.generations.answered(call_id):
+            self.log.debug('Dropping stale response to call %s', call_id)
+            self.call_options.pop(call_id, None)
+            return True
+        return False
+
+    def enable_push(self, schedule):
+        """Dispatch messages as soon as they arrive, not on editor events.
+
+        Without this, queued messages are only handled when ``CursorHold`` or
+        ``CursorMoved`` fire, which needs keystroke tricks to keep happening.
+
+        Args:
+            schedule (Callable[[Callable], None]): Thread-safe function that
+                runs a callback on the editor's main thread soon, like
+                Neovim's ``async_call``.
+        """
+        self.log.debug('enable_push: in')
+        self.schedule = schedule
+
+    def call_soon(self, callback, *args):
+        """Run a callback on the editor's main thread, from any thread.
+
+        With :meth:`enable_push` it's scheduled right away, otherwise it
+        waits for :meth:`run_callbacks` on the next cursor event.
+        """
+        if self.schedule:
+            self.schedule(lambda: callback(*args))
+        else:
+            self.callbacks.append((callback, args))
+
+    def run_callbacks(self):
+        """Run the callbacks left by :meth:`call_soon`, in order."""
+        while self.callbacks:
+            callback, args = self.callbacks.popleft()
+            callback(*args)
+
+    def _unqueue_pushed(self):
+        # Reset before draining so nothing enqueued meanwhile gets stranded
+        self._push_scheduled = False
+        if self.running:
+            self.unqueue()
+
+    def on_receive_error(self, e):
+        """Handle a failed receive on the websocket, called from the receiver."""
+        self.log.error('Websocket exception: %s', e)
+        if self.running and self.supervisor and self.supervisor.active:
+            self.call_soon(self.connection_lost)
+        elif self.running and not self.number_try_connection:
+            # Stop everything and disable plugin
+            self.teardown()
+            self.disable_plugin()
 
     def on_receive(self, name, callback):
         """Executed when a response is received from the server."""
@@ -195,29 +327,220 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
                 self.log.debug('setup(quiet=%s, bootstrap_server=%s) called by %s()',
                                quiet, bootstrap_server, called_by)
                 no_classpath = not os.path.exists(self.launcher.classpath_file)
-                if not bootstrap_server and no_classpath:
-                    if not quiet:
-                        scala = self.launcher.config.get('scala-version')
-                        msg = feedback["prompt_server_install"].format(scala_version=scala)
-                        self.editor.raw_message(msg)
+                if no_classpath or self.installing():
+                    self.server_not_installed(quiet, bootstrap_server)
                     return False
 
-                try:
-                    self.ensime = self.launcher.launch()
-                except InvalidJavaPathError:
-                    self.editor.message('invalid_java')  # TODO: also disable plugin
+                self.launch_server()
 
             return bool(self.ensime)
 
         def ready_to_connect():
             if not self.websocket_exists:
                 return False
-            if not self.ws and self.ensime.is_ready():
+            if not self.ws and self.server_ready:
                 self.connect_ensime_server()
             return True
 
         # True if ensime is up and connection is ok, otherwise False
-        return self.running and lazy_initialize_ensime() and ready_to_connect()
+        if self.running and lazy_initialize_ensime():
+            return ready_to_connect()
+        # Keep the client while the server is being installed
+        return self.running and self.installing()
+
+    def launch_server(self):
+        """Launch the server, or find it running, and watch for it to be ready."""
+        try:
+            self.ensime = self.launcher.launch()
+        except InvalidJavaPathError:
+            self.editor.message('invalid_java')  # TODO: also disable plugin
+        if self.ensime:
+            self.watch_server()
+            self.supervise_server()
+
+    def watch_server(self):
+        """Connect to the launched server as soon as it's ready.
+
+        Until then, editor events only check :attr:`server_ready`.
+        """
+        def on_ready():
+            self.launcher.profile.mark('port')
+            self.server_ready = True
+            self.call_soon(self.on_server_ready)
+
+        self.ready_watcher = ReadinessWatcher(
+            self.ensime.cache_dir, self.ensime.is_ready, on_ready, self.ensime.is_running)
+        self.ready_watcher.start()
+
+    def on_server_ready(self):
+        """Handle the server being ready, see :meth:`watch_server`."""
+        self.log.debug('on_server_ready: in')
+        if self.running and self.websocket_exists and not self.ws:
+            self.connect_ensime_server()
+
+    def supervise_server(self):
+        """Launch the server again if it dies, see :class:`Supervisor`."""
+        self.supervisor = Supervisor(
+            self.ensime,
+            self.relaunch_server,
+            lambda restarts, delay: self.call_soon(self.server_crashed, delay),
+            lambda process: self.call_soon(self.server_restarted, process),
+            lambda: self.call_soon(self.server_gave_up))
+        self.supervisor.start()
+
+    def relaunch_server(self):
+        """Launch the server after it died, called from the supervisor's thread."""
+        return self.launcher.launch()
+
+    def connection_lost(self):
+        """Reconnect to the server, unless it died and is being restarted."""
+        self.log.debug('connection_lost: in')
+        if not self.running or not self.ws:
+            return
+        self.close_websocket()
+        if self.ensime.is_running():
+            self.number_try_connection = 1
+            self.connect_ensime_server()
+
+    def server_crashed(self, delay):
+        self.log.error('Server died, restarting it in %ss', delay)
+        if self.ws:
+            self.close_websocket()
+        self.editor.raw_message(feedback['server_restarting'].format(delay))
+
+    def server_restarted(self, process):
+        """Connect to a server launched again by the supervisor."""
+        self.log.debug('server_restarted: in')
+        if not self.running:
+            process.stop()
+            return
+        self.ensime = process
+        self.ensime_server = None  # Listening on another port
+        self.number_try_connection = 1
+        self.server_ready = False
+        if self.ready_watcher:
+            self.ready_watcher.stop()
+        self.watch_server()
+
+    def server_gave_up(self):
+        if self.running:
+            self.editor.message('server_gave_up')
+            self.teardown()
+            self.disable_plugin()
+
+    def server_stats(self, args, range=None):
+        """Show the resources used by the server, and how often it died."""
+        self.log.debug('server_stats: in')
+        if not self.supervisor:
+            self.editor.message('server_not_running')
+            return
+
+        stats = self.supervisor.stats()
+        unknown = feedback['unknown_stat']
+        minutes, seconds = divmod(int(stats['uptime']), 60)
+        hours, minutes = divmod(minutes, 60)
+        rss, cpu, cpu_time = stats['rss'], stats['cpu'], stats['cpu_time']
+        msg = feedback['server_stats'].format(
+            pid=stats['pid'],
+            uptime='{}:{:02d}:{:02d}'.format(hours, minutes, seconds),
+            rss=unknown if rss is None else '{:.0f} MiB'.format(rss / 2.0 ** 20),
+            cpu=unknown if cpu is None else '{:.1f}%'.format(cpu),
+            cpu_time=unknown if cpu_time is None else '{:.0f}s'.format(cpu_time),
+            restarts=stats['restarts'])
+        self.editor.raw_message(msg)
+
+    def startup_profile(self, args, range=None):
+        """Show how long each phase of the last server startup took."""
+        self.log.debug('startup_profile: in')
+        runs = self.launcher.profile.runs()
+        if not runs:
+            self.editor.message('no_startup_profile')
+            return
+
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(runs[-1]['started']))
+        self.editor.raw_message(feedback['startup_profile'].format(started))
+        for line in describe(runs[-1]):
+            self.editor.raw_message(line)
+
+    def server_not_installed(self, quiet, bootstrap_server):
+        """Install the server, or tell why it can't be launched yet."""
+        if bootstrap_server:
+            self.install_server()
+        elif quiet:
+            return
+        elif self.installing():
+            self.editor.message('bootstrap_running')
+        else:
+            scala = self.launcher.config.get('scala-version')
+            msg = feedback["prompt_server_install"].format(scala_version=scala)
+            self.editor.raw_message(msg)
+
+    def installing(self):
+        """Whether the server is being installed in the background."""
+        return self.bootstrap is not None and self.bootstrap.running
+
+    def install_server(self):
+        """Install the server for the project's Scala version in the background.
+
+        The output of sbt is shown in a scratch window as it comes, and the
+        server is launched once its classpath is saved.
+        """
+        if self.installing():
+            self.editor.message('bootstrap_running')
+            return
+
+        self.editor.split_window(None, size=10, bufopts={
+            'buftype': 'nofile',
+            'bufhidden': 'wipe',
+            'buflisted': False,
+            'swapfile': False,
+        })
+        output = self.output_to_buffer(self.editor.bufnr())
+        self.editor.command('wincmd p')
+
+        self.bootstrap = self.launcher.generate_classpath(
+            output, lambda success: self.call_soon(self.server_installed, success))
+        if self.bootstrap:
+            self.editor.message('bootstrap_started')
+        else:
+            self.editor.message('bootstrap_no_sbt')
+
+    def output_to_buffer(self, bufnr):
+        """Make a callback appending lines to a buffer, from any thread.
+
+        Lines are appended in batches, as they can come faster than round
+        trips to the editor.
+        """
+        lines = deque()
+        flush_scheduled = [False]
+
+        def flush():
+            flush_scheduled[0] = False
+            output = []
+            while lines:
+                output.append(lines.popleft())
+            if output:
+                with catch(Exception):  # The window may be closed already
+                    self.editor.append(output, bufnr=bufnr)
+
+        def on_output(line):
+            lines.append(line)
+            if not flush_scheduled[0]:
+                flush_scheduled[0] = True
+                self.call_soon(flush)
+
+        return on_output
+
+    def server_installed(self, success):
+        """Launch the server once installed by :meth:`install_server`."""
+        if not self.running:
+            return
+        if not success:
+            self.editor.message('bootstrap_failed')
+            return
+        self.editor.message('bootstrap_done')
+        self.connection_attempts = 0
+        self.setup(quiet=False, bootstrap_server=False)
 
     def tell_module_missing(self, name):
         """Warn users that a module is not available in their machines."""
@@ -275,19 +598,34 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
                 port = self.ensime.http_port()
                 uri = "websocket" if self.launcher.server_v2 else "jerky"
                 self.ensime_server = gconfig["ensime_server"].format(port, uri)
+            if self.ws:
+                self.close_websocket()
             with catch(Exception, disable_completely):
-                from websocket import create_connection
                 # Use the default timeout (no timeout).
                 options = {"subprotocols": ["jerky"]} if self.launcher.server_v2 else {}
                 self.log.debug("About to connect to %s with options %s",
                                self.ensime_server, options)
-                self.ws = create_connection(self.ensime_server, **options)
+                if self.engine:
+                    self.ws = self.engine.connect(self.ensime_server, self.on_message,
+                                                  self.on_receive_error, **options)
+                else:
+                    from websocket import create_connection
+                    self.ws = create_connection(self.ensime_server, **options)
+                    self.receiver.register(self.ws, self.on_message, self.on_receive_error)
             if self.ws:
+                self.launcher.profile.mark('connect')
                 self.send_request({"typehint": "ConnectionInfoReq"})
         else:
             # If it hits this, number_try_connection is 0
             disable_completely(None)
 
+    def close_websocket(self):
+        """Stop receiving on the current websocket and close it."""
+        self.receiver.unregister(self.ws)
+        with catch(Exception):
+            self.ws.close()
+        self.ws = None
+
     def shutdown_server(self):
         """Shut down server if it is alive."""
         self.log.debug('shutdown_server: in')
@@ -298,6 +636,16 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         """Tear down the server or keep it alive."""
         self.log.debug('teardown: in')
         self.running = False
+        if self.bootstrap:
+            self.bootstrap.stop()
+        if self.ready_watcher:
+            self.ready_watcher.stop()
+        if self.supervisor:
+            self.supervisor.stop()
+        if self.ws:
+            self.close_websocket()
+        if self._owns_receiver:
+            self.receiver.shutdown()
         self.shutdown_server()
         shutil.rmtree(self.tmp_diff_folder, ignore_errors=True)
 
@@ -316,15 +664,13 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         if decl_pos["typehint"] == "LineSourcePosition":
             self.editor.set_cursor(decl_pos['line'], 0)
         else:  # OffsetSourcePosition
-            point = decl_pos["offset"]
-            self.editor.goto(point + 1)
+            row, col = self.editor.line_index().position(decl_pos["offset"])
+            self.editor.set_cursor(row, col)
 
     def get_position(self, row, col):
         """Get char position in all the text from row and column."""
-        result = col
         self.log.debug('%s %s', row, col)
-        lines = self.editor.getlines()[:row - 1]
-        result += sum([len(l) + 1 for l in lines])
+        result = self.editor.line_index().offset(row, col)
         self.log.debug(result)
         return result
 
@@ -332,8 +678,9 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         self.log.debug('open_decl_for_inspector_symbol: in')
         lineno = self.editor.cursor()[0]
         symbol = self.editor.symbol_for_inspector_line(lineno)
+        call_id = self.expect_response()
         self.symbol_by_name([symbol])
-        self.unqueue(should_wait=True)
+        self.wait_for_response(call_id)
 
     def symbol_by_name(self, args, range=None):
         self.log.debug('symbol_by_name: in')
@@ -354,13 +701,18 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         self.send_request(req)
 
     def complete(self, row, col):
+        """Request completions at a position, returning the call ID to await."""
         self.log.debug('complete: in')
+        # Snapshot first, the position is then found from the same lines
+        file_info = self._file_info()
         pos = self.get_position(row, col)
-        self.send_request({"point": pos, "maxResults": 100,
-                           "typehint": "CompletionsReq",
-                           "caseSens": True,
-                           "fileInfo": self._file_info(),
-                           "reload": False})
+        self.expect_response()
+        return self.send_request({"point": pos,
+                                  "maxResults": self.completion_max_results,
+                                  "typehint": "CompletionsReq",
+                                  "caseSens": False,
+                                  "fileInfo": file_info,
+                                  "reload": False})
 
     def send_at_point_req(self, what, path, row, col, size, where="range"):
         """Ask the server to perform an operation at a given position."""
@@ -385,12 +737,13 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
     def en_install(self, args, range=None):
         """Bootstrap ENSIME server installation.
 
-        Enabling the bootstrapping actually happens in the execute_with_client
-        decorator when this is called, so this function is a no-op endpoint for
-        the Vim command.
-        TODO: this is confusing...
+        For a new client, the install is started by the execute_with_client
+        decorator when this is called. A client kept while the server isn't
+        installed starts it here.
         """
         self.log.debug('en_install: in')
+        if not self.installing() and not os.path.exists(self.launcher.classpath_file):
+            self.install_server()
 
     def format_source(self, args, range=None):
         self.log.debug('type_check_cmd: in')
@@ -609,6 +962,8 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
 
         message = {'callId': self.call_id, 'req': request}
         self.log.debug('send_request: %s', Pretty(message))
+        # No cancellation in the ENSIME protocol, older calls' replies get dropped
+        self.generations.started(request.get('typehint'), self.call_id)
         self.send(json.dumps(message))
 
         call_id = self.call_id
@@ -622,54 +977,89 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         # single-file errors.
         self.editor.clean_errors()
 
+    def buffer_enter(self, filename):
+        """User entered a buffer, show the errors we know of for it."""
+        self.log.debug('buffer_enter: %s', filename)
+        self.editor.attach_buffer()
+        self.show_buffer_notes()
+
     def type_check(self, filename):
         """Update type checking when user saves buffer."""
         self.log.debug('type_check: in')
-        self.editor.clean_errors()
+        if not self.currently_buffering_typechecks:
+            # No notes are coming to replace the current ones
+            self.editor.clean_errors()
+        path = self.editor.path()
+        # The server reports the file's notes anew
+        self.project_notes.clear(path)
+        self.mark_typechecked(path)
         self.send_request(
             {"typehint": "TypecheckFilesReq",
-             "files": [self.editor.path()]})
-
-    def unqueue(self, timeout=10, should_wait=False):
-        """Unqueue all the received ensime responses for a given file."""
-        def trigger_callbacks(_json):
-            for name in self.receive_callbacks:
-                self.log.debug('launching callback: %s', name)
-                self.receive_callbacks[name](self, _json["payload"])
-
-        start, now = time.time(), time.time()
-        wait = self.queue.empty() and should_wait
-        while (not self.queue.empty() or wait) and (now - start) < timeout:
-            if wait and self.queue.empty():
-                time.sleep(0.25)
-                now = time.time()
-            else:
-                result = self.queue.get(False)
-                self.log.debug('unqueue: result received\n%s', result)
-                if result and result != "nil":
-                    wait = None
-                    # Restart timeout
-                    start, now = time.time(), time.time()
-                    _json = json.loads(result)
-                    # Watch out, it may not have callId
-                    call_id = _json.get("callId")
-                    if _json["payload"]:
-                        trigger_callbacks(_json)
-                        self.handle_incoming_response(call_id, _json["payload"])
-                else:
-                    self.log.debug('unqueue: nil or None received')
+             "files": [path]})
+
+    def expect_response(self):
+        """Register the next request as awaited by :meth:`wait_for_response`.
+
+        This must happen before the request is sent, so that the response
+        can't slip into the queue first.
+
+        Returns:
+            int: The ``callId`` the next request will have.
+        """
+        self.pending.expect(self.call_id)
+        return self.call_id
+
+    def wait_for_response(self, call_id, timeout=10):
+        """Block until the response to ``call_id`` arrives and handle it.
 
-        if (now - start) >= timeout:
-            self.log.warning('unqueue: no reply from server for %ss', timeout)
+        Only the awaited response is handled, unrelated messages are left in
+        the queue for :meth:`unqueue`.
+
+        Returns:
+            bool: Whether the response arrived before ``timeout`` seconds.
+        """
+        call = self.pending.get(call_id)
+        if call is None:
+            self.log.warning('wait_for_response: call %s is not pending', call_id)
+            return False
+
+        call.wait(timeout)
+        self.pending.discard(call_id)
+        if not call.done():
+            self.log.warning('wait_for_response: no reply from server for %ss', timeout)
+            return False
+
+        self.dispatch(call.response)
+        return True
+
+    def dispatch(self, _json):
+        """Trigger callbacks and handlers for a decoded server message."""
+        if not _json["payload"]:
+            return
+        for name in self.receive_callbacks:
+            self.log.debug('launching callback: %s', name)
+            self.receive_callbacks[name](self, _json["payload"])
+        self.handle_incoming_response(_json.get("callId"), _json["payload"])
+
+    def unqueue(self):
+        """Dispatch all the received ensime messages."""
+        while True:
+            try:
+                _json = self.queue.get(False)
+            except Empty:
+                break
+            self.dispatch(_json)
 
     def unqueue_and_display(self, filename):
         """Unqueue messages and give feedback to user (if necessary)."""
         if self.running and self.ws:
             self.editor.lazy_display_error(filename)
             self.unqueue()
+            self.typecheck_if_due()
 
     def on_cursor_hold(self, filename):
         """Handler for event CursorHold."""
+        self.run_callbacks()
         if self.connection_attempts < 10:
             # Trick to connect ASAP when
             # plugin is  started without
@@ -677,10 +1067,13 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
             self.setup(True, False)
             self.connection_attempts += 1
         self.unqueue_and_display(filename)
-        self.editor.cursorhold()
+        if not self.schedule:
+            # Keep CursorHold firing to poll for messages
+            self.editor.cursorhold()
 
     def on_cursor_move(self, filename):
         """Handler for event CursorMoved."""
+        self.run_callbacks()
         self.setup(True, False)
         self.unqueue_and_display(filename)
 
@@ -702,38 +1095,60 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
             line = self.editor.getline()
             while start > 0 and line[start - 1] not in " .":
                 start -= 1
-            # Start should be 1 when startcol is zero
-            return row, col, start if start else 1
+            return row, col, start, line[:start], line[start:col]
 
         if str(findstart) == "1":
-            row, col, startcol = detect_row_column_start()
+            row, col, start, context, prefix = detect_row_column_start()
+            path = self.editor.path()
 
-            # Make request to get response ASAP
-            self.complete(row, col)
-            self.completion_started = True
+            # A previous completion that was never finished isn't awaited
+            if self.completion_call_id is not None:
+                self.pending.discard(self.completion_call_id)
+                self.completion_call_id = None
 
-            # We always allow autocompletion, even with empty seeds
-            return startcol
+            session = self.completion_session
+            if session and session.covers(path, row, context, prefix):
+                self.log.debug('complete_func: reusing completions for %s', session.prefix)
+            else:
+                # Make request to get response ASAP
+                session = CompletionSession(path, row, context, prefix,
+                                            self.completion_max_results)
+                self.completion_session = session
+                session.call_id = self.completion_call_id = self.complete(row, col)
+            self.completion_prefix = prefix
+
+            # We always allow autocompletion, even with empty seeds.
+            # Start should be 1 when startcol is zero
+            return start if start else 1
         else:
             result = []
             # Only handle snd invocation if fst has already been done
-            if self.completion_started:
-                # Unqueing messages until we get suggestions
-                self.unqueue(timeout=self.completion_timeout, should_wait=True)
-                suggestions = self.suggestions or []
+            if self.completion_prefix is not None:
+                if self.completion_call_id is not None:
+                    # Wake up as soon as our own response arrives
+                    self.wait_for_response(self.completion_call_id,
+                                           timeout=self.completion_timeout)
+                    self.completion_call_id = None
                 self.log.debug('complete_func: suggestions in')
-                for m in suggestions:
-                    result.append(m)
+                completions = self.completion_session.rank(
+                    self.completion_prefix, self.completion_max_suggestions)
+                result = [completion_to_suggest(c) for c in completions]
                 self.suggestions = None
-                self.completion_started = False
+                self.completion_prefix = None
             return result
 
     def _file_info(self):
-        """Message fragment for ENSIME ``fileInfo`` field, from current file."""
-        return {
-            'file': self.editor.path(),
-            'contents': self.editor.get_file_content(),
-        }
+        """Message fragment for ENSIME ``fileInfo`` field, from current file.
+
+        Contents are left out when they're identical to the file on disk,
+        since the server then reads the same version itself.
+        """
+        path = self.editor.path()
+        snapshot = self.editor.snapshot()
+        info = {'file': path}
+        if snapshot.digest != self.disk_digests.get(path):
+            info['contents'] = snapshot.text
+        return info
 
 
 class EnsimeClientV1(ProtocolHandlerV1, EnsimeClient):
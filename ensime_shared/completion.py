@@ -0,0 +1,203 @@
+# coding: utf-8
+
+"""
+Client-side ranking and reuse of completion results while an identifier is
+being typed.
+"""
+
+import heapq
+
+# Score tiers, a better kind of match always outranks a worse one
+EXACT_PREFIX = 400
+PREFIX = 300
+HUMPS = 200
+SUBSEQUENCE = 100
+
+
+class CandidateKey(object):
+    """Precomputed matching data for a completion candidate's name.
+
+    Humps are where the words of a camelCase or snake_case name begin, e.g.
+    ``f``, ``L`` in ``foldLeft``.
+    """
+
+    __slots__ = ('name', 'lower', 'humps', 'hump_positions', 'hump_list')
+
+    def __init__(self, name):
+        self.name = name
+        self.lower = name.lower()
+        positions = [i for i, ch in enumerate(name)
+                     if i == 0 or name[i - 1] in '_$' or
+                     (ch.isupper() and not name[i - 1].isupper())]
+        self.hump_list = positions
+        self.hump_positions = frozenset(positions)
+        self.humps = ''.join(self.lower[i] for i in positions)
+
+
+def fuzzy_score(pattern, key):
+    """Score how well a typed ``pattern`` matches a candidate.
+
+    Matching ignores case. Prefix matches rank above camel hump matches
+    (``fL`` for ``foldLeft``), which rank above any other subsequence match.
+    Within a tier, matches on word starts and consecutive characters score
+    higher than scattered ones.
+
+    Args:
+        pattern (str): The text typed so far.
+        key (CandidateKey): The candidate.
+
+    Returns:
+        Optional[int]: Higher is better, ``None`` if the candidate doesn't
+        match at all.
+    """
+    return _score(pattern, pattern.lower(), key)
+
+
+def _score(pattern, lower, key):
+    if not pattern:
+        return PREFIX
+    if key.name.startswith(pattern):
+        return EXACT_PREFIX
+    if key.lower.startswith(lower):
+        return PREFIX
+    if key.humps.startswith(lower):
+        return HUMPS + len(lower)
+
+    bonus = _subsequence_bonus(lower, key, True)
+    if bonus is None:
+        bonus = _subsequence_bonus(lower, key, False)
+        if bonus is None:
+            return None
+    return SUBSEQUENCE + min(bonus, HUMPS - SUBSEQUENCE - 1)
+
+
+def _subsequence_bonus(lower, key, prefer_humps):
+    """Match ``lower`` as a subsequence of the key, left to right.
+
+    With ``prefer_humps``, a character jumps ahead to a word start if there
+    is one, which can miss matches a plain greedy match would find.
+    """
+    bonus, pos, previous = 0, 0, -2
+    for ch in lower:
+        found = key.lower.find(ch, pos)
+        if found < 0:
+            return None
+        if prefer_humps and found not in key.hump_positions:
+            for hump in key.hump_list:
+                if hump > found and key.lower[hump] == ch:
+                    found = hump
+                    break
+        if found in key.hump_positions:
+            bonus += 4
+        if found == previous + 1:
+            bonus += 2
+        previous = pos = found
+        pos += 1
+    return bonus - previous // 4
+
+
+def rank(pattern, keys, limit=None, among=None):
+    """Rank candidates for a typed ``pattern`` with :func:`fuzzy_score`.
+
+    Ties are broken by shorter names first, then by the original order.
+
+    Args:
+        pattern (str): The text typed so far.
+        keys (Sequence[CandidateKey]): Candidates, e.g. in the server's order.
+        limit (Optional[int]): Maximum number of results.
+        among (Optional[Iterable[int]]): Only consider these indices of
+            ``keys``, e.g. the matches for a shorter pattern.
+
+    Returns:
+        List[int]: Indices into ``keys`` of the matching candidates, best first.
+    """
+    return _best(_scored(pattern, keys, among), limit)
+
+
+def _scored(pattern, keys, among):
+    """Sort keys of the matching candidates, in the order considered."""
+    lower = pattern.lower()
+    scored = []
+    for i in (range(len(keys)) if among is None else among):
+        key = keys[i]
+        score = _score(pattern, lower, key)
+        if score is not None:
+            scored.append((-score, len(key.name), i))
+    return scored
+
+
+def _best(scored, limit):
+    if limit is not None and limit < len(scored):
+        scored = heapq.nsmallest(limit, scored)
+    else:
+        scored = sorted(scored)
+    return [i for _, _, i in scored]
+
+
+class CompletionSession(object):
+    """Completions requested for an identifier starting at a given position.
+
+    As long as the user keeps typing the same identifier, the server's answer
+    for a shorter prefix contains every answer for a longer one, so further
+    keystrokes can be completed by filtering locally instead of asking again.
+    That only holds if the server didn't truncate its answer, and if the
+    text before the identifier, like the receiver of a member, is unchanged.
+
+    Args:
+        path (str): File being completed.
+        row (int): Line of the identifier, 1-based.
+        context (str): The line up to where the identifier starts.
+        prefix (str): Part of the identifier typed when completions were
+            requested.
+        max_results (int): ``maxResults`` the completions were requested with.
+    """
+
+    def __init__(self, path, row, context, prefix, max_results):
+        self.path = path
+        self.row = row
+        self.context = context
+        self.prefix = prefix
+        self.max_results = max_results
+        self.call_id = None
+        self.completions = None
+        self._received = 0
+        self._keys = None
+        self._matched = None  # (prefix, indices in order) from the last ranking
+
+    def update(self, completions):
+        """Store the server's ``CompletionInfo`` list for this session."""
+        # filter out completions without `typeInfo` field to avoid server bug. See #324
+        self.completions = [c for c in completions if "typeInfo" in c]
+        self._received = len(completions)
+        self._keys = None
+        self._matched = None
+
+    @property
+    def complete(self):
+        """bool: Whether all completions for :attr:`prefix` are known."""
+        return self.completions is not None and self._received < self.max_results
+
+    def covers(self, path, row, context, prefix):
+        """Whether completing ``prefix`` after ``context`` can reuse this session."""
+        return (self.complete and
+                (path, row, context) == (self.path, self.row, self.context) and
+                prefix.startswith(self.prefix))
+
+    def rank(self, prefix, limit=None):
+        """Completions matching ``prefix``, best first. See :func:`rank`.
+
+        Only candidates that matched a shorter prefix can match a longer one,
+        so successive keystrokes score a shrinking subset, and only the best
+        ``limit`` of them are sorted.
+        """
+        if self.completions is None:
+            return []
+        if self._keys is None:
+            self._keys = [CandidateKey(c["name"]) for c in self.completions]
+
+        among = None
+        if self._matched and prefix.lower().startswith(self._matched[0].lower()):
+            among = self._matched[1]
+        scored = _scored(prefix, self._keys, among)
+        self._matched = (prefix, [i for _, _, i in scored])
+        return [self.completions[i] for i in _best(scored, limit)]
@@ -20,6 +20,13 @@ gconfig = {
 # Messages for user feedback, possible l10n fodder. Please keep alphabetized.
 feedback = {
     "analyzer_ready": "Analyzer is ready",
+    "asyncio_needs_python3":
+        "The asyncio transport needs Python 3, using the default transport",
+    "bootstrap_done": "Server installed, starting it...",
+    "bootstrap_failed": "Server install failed, see the sbt output for details",
+    "bootstrap_no_sbt": "Could not run sbt to install the server, is it on your PATH?",
+    "bootstrap_running": "Server install already running...",
+    "bootstrap_started": "Installing the server in the background...",
     "failed_refactoring": "The refactoring could not be applied (more info at logs)",
     "full_types_enabled_off": "Qualified type display disabled",
     "full_types_enabled_on": "Qualified type display enabled",
@@ -30,14 +37,24 @@ feedback = {
     "manual_doc": "Go to {}",
     "missing_debug_class": "You must specify a class to debug",
     "module_missing": "{} missing: do a `pip install {}` and restart vim",
+    "no_diagnostics": "No errors or warnings known, try :EnTypeCheck",
+    "no_startup_profile": "No server startup recorded yet",
     "notify_break": "Execution paused at breakpoint line {} in {}",
     "package_inspect_current": "Using currently focused package...",
     "prompt_server_install":
         "Please run :EnInstall to install the ENSIME server for Scala {scala_version}",
+    "server_gave_up": "Server keeps dying, see .ensime_cache/server.log",
+    "server_not_running": "Server is not running",
+    "server_restarting": "Server died, restarting it in {:.0f}s...",
+    "server_stats":
+        "Server pid {pid} up {uptime}: {rss} resident, {cpu} CPU "
+        "(total {cpu_time}), {restarts} restart(s)",
     "spawned_browser": "Opened tab {}",
     "start_message": "Server has been started...",
+    "startup_profile": "Server startup at {}, seconds since then and for each phase:",
     "symbol_search_symbol_required": "Must provide symbols to search for!",
     "typechecking": "Typechecking...",
+    "unknown_stat": "?",
     "unknown_symbol": "Symbol not found",
 }
 
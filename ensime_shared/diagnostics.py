@@ -0,0 +1,178 @@
+# coding: utf-8
+
+"""
+Storage for the notes ENSIME reports, such as typecheck errors: indexed for
+the lookups done as the cursor moves, kept for the whole project, and cached
+on disk between sessions.
+"""
+
+import json
+import os
+from bisect import bisect_right
+
+
+class Diagnostics(object):
+    """Errors indexed by file path, then by line.
+
+    Errors on a line are kept sorted by starting column, so finding the one
+    under the cursor is a couple of dictionary hits and a bisection instead
+    of a scan of every note reported for the project.
+    """
+
+    def __init__(self):
+        self._files = {}  # path -> {line: ([start column], [Error])}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for lines in self._files.values():
+            for _, errors in lines.values():
+                for error in errors:
+                    yield error
+
+    def add(self, error):
+        """Add an :class:`~ensime_shared.errors.Error`."""
+        lines = self._files.setdefault(error.path, {})
+        starts, errors = lines.setdefault(error.l, ([], []))
+        i = bisect_right(starts, error.c)
+        starts.insert(i, error.c)
+        errors.insert(i, error)
+        self._count += 1
+
+    def at(self, path, row, col):
+        """Get the error covering a position, or ``None``.
+
+        Args:
+            path (str): Absolute path of the file.
+            row (int): Line, 1-based.
+            col (int): Column, 0-based.
+
+        Returns:
+            Optional[Error]: The innermost error starting at or before ``col``
+            and ending after it.
+        """
+        lines = self._files.get(path)
+        if not lines or row not in lines:
+            return None
+        starts, errors = lines[row]
+        for i in range(bisect_right(starts, col) - 1, -1, -1):
+            if col < errors[i].e:
+                return errors[i]
+        return None
+
+    def on_line(self, path, row):
+        """Errors on a line of a file, by starting column."""
+        lines = self._files.get(path)
+        if not lines or row not in lines:
+            return []
+        return list(lines[row][1])
+
+    def clear(self, path=None):
+        """Forget the errors of a file, or all of them."""
+        if path is None:
+            self._files = {}
+            self._count = 0
+            return
+        lines = self._files.pop(os.path.abspath(path), {})
+        self._count -= sum(len(errors) for _, errors in lines.values())
+
+
+class ProjectNotes(object):
+    """Notes reported for any file of a project, as the server sent them.
+
+    Kept across buffer switches, so a buffer's notes can be shown again
+    without another typecheck.
+    """
+
+    def __init__(self):
+        self._notes = {}  # path -> [note]
+
+    def __len__(self):
+        return sum(len(notes) for notes in self._notes.values())
+
+    def __iter__(self):
+        """Iterate over all notes, by file and position."""
+        for path in sorted(self._notes):
+            for note in self.for_file(path):
+                yield note
+
+    def add(self, notes):
+        """Add notes from a ``NewScalaNotesEvent``."""
+        for note in notes:
+            self._notes.setdefault(os.path.abspath(note['file']), []).append(note)
+
+    def for_file(self, path):
+        """Notes of a file, by position."""
+        notes = self._notes.get(os.path.abspath(path), [])
+        return sorted(notes, key=lambda note: (note['line'], note['col']))
+
+    def clear(self, path=None):
+        """Forget the notes of a file, or all of them."""
+        if path is None:
+            self._notes = {}
+        else:
+            self._notes.pop(os.path.abspath(path), None)
+
+
+class NotesCache(object):
+    """Last known notes of files, persisted across editor sessions.
+
+    Stored as a JSON file, with the notes of each file under the digest of
+    the contents they were reported for, so that they're only shown again for
+    identical contents. Digests are those of
+    :class:`~ensime_shared.buffers.BufferSnapshot` and
+    :class:`~ensime_shared.buffers.DiskDigests`.
+
+    Args:
+        filepath (str): Path of the cache file, in the project's cache dir.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._entries = None  # path -> {'digest': str, 'notes': [note]}
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self.entries
+
+    @property
+    def entries(self):
+        """dict: Cache contents, read from disk on first use."""
+        if self._entries is None:
+            try:
+                with open(self.filepath) as f:
+                    self._entries = json.load(f)
+            except (IOError, OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, path, digest):
+        """Notes of a file if they were cached for contents with ``digest``."""
+        entry = self.entries.get(os.path.abspath(path))
+        if entry and entry['digest'] == digest:
+            return entry['notes']
+        return None
+
+    def update(self, path, digest, notes):
+        """Replace the cached notes of a file, dropping them if there are none."""
+        path = os.path.abspath(path)
+        if notes and digest:
+            self.entries[path] = {'digest': digest, 'notes': notes}
+        else:
+            self.entries.pop(path, None)
+
+    def save(self):
+        """Write the cache to disk, replacing the file in one go.
+
+        Returns:
+            bool: Whether the cache could be written.
+        """
+        tmp = self.filepath + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.entries, f)
+            os.rename(tmp, self.filepath)
+        except (IOError, OSError):
+            return False
+        return True
@@ -1,7 +1,11 @@
 # coding: utf-8
+import time
+from contextlib import contextmanager
 from os import path
 
+from .buffers import BufferSnapshot, LineIndex
 from .config import feedback
+from .diagnostics import Diagnostics
 from .errors import Error
 
 
@@ -12,36 +16,110 @@ class Editor(object):
         self._isneovim = bool(self._vim.eval("has('nvim')"))
 
         # Old API
-        self._errors = []   # Line error structs reported from ENSIME notes
+        self._errors = Diagnostics()   # Line error structs reported from ENSIME notes
 
-        # Vim highlight matches for errors, for clearing
-        # TODO: this seems unneeded, clearmatches()
-        self._matches = []
+        # Vim highlight match IDs for errors, by (line, start col, end col).
+        # On Neovim, highlights are in a namespace instead and have no IDs.
+        self._matches = {}
+        self._namespace = None
+        # Show error messages as virtual text at the end of lines, on Neovim
+        self.virtual_text = False
 
-    def append(self, text, afterline=None):
-        """Append text to the current buffer.
+        self._line_indexes = {}  # Buffer number -> LineIndex
+        self._snapshots = {}  # Buffer number -> BufferSnapshot
+        # BufferMirrors kept up to date by Neovim, serving buffer contents
+        # without copying them over RPC
+        self.mirrors = None
+
+        self._batch = None  # Commands queued by batch()
+        self._hasexecute = None  # Whether Vim has execute(), checked lazily
+
+    def append(self, text, afterline=None, bufnr=None):
+        """Append text to the current buffer, or another one.
 
         Args:
             text (str or Sequence[str]): One or many lines of text to append.
             afterline (Optional[int]):
                 Line number to append after. If 0, text is prepended before the
                 first line; if ``None``, at end of the buffer.
+            bufnr (Optional[int]): Number of the buffer, if not the current one.
         """
+        buffer = self._vim.buffers[bufnr] if bufnr else self._vim.current.buffer
         if afterline:
-            self._vim.current.buffer.append(text, afterline)
+            buffer.append(text, afterline)
+        else:
+            buffer.append(text)
+
+    @contextmanager
+    def batch(self):
+        """Queue the commands run with :meth:`command` in a block, then run
+        them all in one round trip to the editor when the block exits.
+
+        Only commands are queued: evals and buffer or window changes made
+        through the Python API within the block still happen right away, so
+        don't rely on the effects of queued commands there. A batch entered
+        within another joins it. If the block raises, nothing is run.
+        """
+        if self._batch is not None:
+            yield
+            return
+
+        self._batch = []
+        try:
+            yield
+            commands = self._batch
+        finally:
+            self._batch = None
+        if commands:
+            self._run_commands(commands)
+
+    def command(self, cmd):
+        """Run an Ex command, or queue it if within a :meth:`batch`."""
+        if self._batch is not None:
+            self._batch.append(cmd)
         else:
-            self._vim.current.buffer.append(text)
+            self._vim.command(cmd)
+
+    def _run_commands(self, commands):
+        if len(commands) == 1:
+            self._vim.command(commands[0])
+        elif self.isneovim:
+            calls = [['nvim_command', [cmd]] for cmd in commands]
+            _, error = self._vim.api.call_atomic(calls)
+            if error:
+                index, _, msg = error
+                raise RuntimeError('{}: {}'.format(commands[index], msg))
+        else:
+            if self._hasexecute is None:
+                self._hasexecute = bool(int(self._vim.eval("exists('*execute')")))
+            if self._hasexecute:
+                self._vim.command('call execute([{}])'.format(
+                    ', '.join(vim_string(cmd) for cmd in commands)))
+            else:
+                for cmd in commands:
+                    self._vim.command(cmd)
 
     @property
     def isneovim(self):
         """bool: Whether the underlying editor is Neovim. Use this sparingly."""
         return self._isneovim
 
+    def bufnr(self):
+        """int: Number of the current buffer."""
+        return self._vim.current.buffer.number
+
     # TODO: make this read-only property-like?
     def current_word(self):
         """Get the current word under the cursor."""
         return self._vim.eval('expand("<cword>")')
 
+    def changedtick(self):
+        """int: Value of ``b:changedtick`` for the current buffer.
+
+        This is incremented by Vim on every change to the buffer's text.
+        """
+        return int(self._vim.eval('b:changedtick'))
+
     def doautocmd(self, *autocmds):
         """Invoke Vim autocommands on-demand.
 
@@ -49,11 +127,11 @@ class Editor(object):
             *autocmds (str): Names of autocommands to trigger.
                 See ``:h autocmd-events``.
         """
-        self._vim.command('doautocmd ' + ','.join(autocmds))
+        self.command('doautocmd ' + ','.join(autocmds))
 
     def edit(self, fpath):
         """Edit a file with path ``fpath``, in the current window."""
-        self._vim.command('edit ' + fpath)
+        self.command('edit ' + fpath)
 
     def getline(self, lnum=None):
         """Get a line from the current buffer.
@@ -77,11 +155,46 @@ class Editor(object):
             List[str]
         """
         buf = self._vim.buffers[bufnr] if bufnr else self._vim.current.buffer
-        return buf[:]
+        mirror = self._mirror(buf)
+        return list(mirror.lines) if mirror else buf[:]
+
+    def attach_buffer(self):
+        """Mirror the current buffer's contents locally, if supported."""
+        if self.mirrors is not None:
+            self.mirrors.attach(self._vim.current.buffer)
+
+    def _mirror(self, buf):
+        """The :class:`~ensime_shared.buffers.BufferMirror` of a buffer, if any."""
+        if self.mirrors is None:
+            return None
+        return self.mirrors.get(buf.number)
 
     def goto(self, offset):
         """Go to a specific byte offset in the current buffer."""
-        self._vim.command('goto {}'.format(offset))
+        self.command('goto {}'.format(offset))
+
+    def line_index(self):
+        """Get a :class:`~ensime_shared.buffers.LineIndex` for the current buffer.
+
+        The index is cached per buffer and reused until the buffer changes,
+        so that position conversions don't need to fetch all of its lines.
+        """
+        buf = self._vim.current.buffer
+        mirror = self._mirror(buf)
+        if mirror:
+            return mirror.line_index()
+
+        tick = self.changedtick()
+        index = self._line_indexes.get(buf.number)
+        if index is None or index.changedtick != tick:
+            snapshot = self._snapshots.get(buf.number)
+            if snapshot and snapshot.changedtick == tick:
+                lines = snapshot.lines  # Already fetched, don't ask again
+            else:
+                lines = buf
+            index = LineIndex(lambda start, end: lines[start:end], tick)
+            self._line_indexes[buf.number] = index
+        return index
 
     def menu(self, prompt, choices):
         """Presents a selection menu and returns the user's choice.
@@ -160,9 +273,9 @@ class Editor(object):
             bufnr (Optional[int]): A Vim buffer number, current if ``None``.
         """
         if bufnr:
-            self._vim.command(str(bufnr) + 'bufdo set filetype=' + filetype)
+            self.command(str(bufnr) + 'bufdo set filetype=' + filetype)
         else:
-            self._vim.command('set filetype=' + filetype)
+            self.command('set filetype=' + filetype)
 
     def split_window(self, fpath, vertical=False, size=None, bufopts=None):
         """Open file in a new split window.
@@ -181,7 +294,7 @@ class Editor(object):
         if size:
             command = str(size) + command
 
-        self._vim.command(command)
+        self.command(command)
 
         if bufopts:
             self.set_buffer_options(bufopts)
@@ -197,7 +310,7 @@ class Editor(object):
             usage of noautocmd. See #298
         """
         cmd = 'noautocmd write' if noautocmd else 'write'
-        self._vim.command(cmd)
+        self.command(cmd)
 
     # -----------------------------------------------------------------------
     # -                               OLD API                               -
@@ -212,17 +325,19 @@ class Editor(object):
         # TODO: This seems wrong, the user setting value is never used anywhere.
         if 'EnErrorStyle' not in self._vim.vars:
             self._vim.vars['EnErrorStyle'] = 'EnError'
-        self._vim.command('highlight EnErrorStyle ctermbg=red gui=underline')
 
-        # TODO: this SHOULD be a buffer-local setting only, and since it should
-        # apply to all Scala files, ftplugin is the ideal place to set it. I'm
-        # not even sure how this is currently working when only set once.
-        self._vim.command('set omnifunc=EnCompleteFunc')
+        with self.batch():
+            self.command('highlight EnErrorStyle ctermbg=red gui=underline')
+
+            # TODO: this SHOULD be a buffer-local setting only, and since it should
+            # apply to all Scala files, ftplugin is the ideal place to set it. I'm
+            # not even sure how this is currently working when only set once.
+            self.command('set omnifunc=EnCompleteFunc')
 
-        # TODO: custom filetype ftplugin
-        self._vim.command(
-            'autocmd FileType package_info nnoremap <buffer> <Space> :call EnPackageDecl()<CR>')
-        self._vim.command('autocmd FileType package_info setlocal splitright')
+            # TODO: custom filetype ftplugin
+            self.command(
+                'autocmd FileType package_info nnoremap <buffer> <Space> :call EnPackageDecl()<CR>')
+            self.command('autocmd FileType package_info setlocal splitright')
 
     # TODO: make this a R/W property?
     def cursor(self):
@@ -235,14 +350,17 @@ class Editor(object):
         """Set cursor position to given row and column in the current window."""
         self._vim.current.window.cursor = (row, col)
 
-    # TODO: don't displace user's cursor; can something like ``getpos()`` do this?
     def start_end_pos(self):
-        """Return start and end positions of the cursor respectively."""
-        self._vim.command('normal e')
-        end = self.cursor()
-        self._vim.command('normal b')
-        beg = self.cursor()
-        return beg, end
+        """Return start and end positions of the symbol under the cursor.
+
+        Like moving to the end and back to the beginning of a word, but it
+        leaves the cursor alone; see :func:`symbol_bounds`.
+        """
+        row, col = self.cursor()
+        line = self.getline()
+        # The cursor column counts bytes, decoded lines count characters
+        start, end = symbol_bounds(line, _char_col(line, col))
+        return (row, _byte_col(line, start)), (row, _byte_col(line, end))
 
     def path(self):
         """Return the current path."""
@@ -250,7 +368,23 @@ class Editor(object):
 
     def get_file_content(self):
         """Get content of file."""
-        return "\n".join(self._vim.current.buffer)
+        return self.snapshot().text
+
+    def snapshot(self):
+        """Get a :class:`~ensime_shared.buffers.BufferSnapshot` of the current
+        buffer, cached until the buffer changes.
+        """
+        buf = self._vim.current.buffer
+        mirror = self._mirror(buf)
+        if mirror:
+            return mirror.snapshot()
+
+        tick = self.changedtick()
+        snapshot = self._snapshots.get(buf.number)
+        if snapshot is None or snapshot.changedtick != tick:
+            snapshot = BufferSnapshot(buf[:], tick)
+            self._snapshots[buf.number] = snapshot
+        return snapshot
 
     # This is used only once, maybe just make a higher-level API or inline it
     def width(self):
@@ -259,12 +393,8 @@ class Editor(object):
 
     def ask_input(self, prompt):
         """Prompt user for input and return the entered value."""
-        self._vim.command('call inputsave()')
-        self._vim.command('let user_input = input("{} ")'.format(prompt))
-        self._vim.command('call inputrestore()')
-        response = self._vim.eval('user_input')
-        self._vim.command('unlet user_input')
-        return response
+        return self._vim.eval('[inputsave(), input({}), inputrestore()][1]'.format(
+            vim_string(prompt + ' ')))
 
     def to_quickfix_item(self, file_name, line_number, message, tpe):
         return {"filename": file_name,
@@ -273,29 +403,33 @@ class Editor(object):
                 "type": tpe}
 
     def write_quickfix_list(self, qflist):
-        self._vim.command('call setqflist({!s})'.format(qflist))
-        self._vim.command('copen')
+        with self.batch():
+            self.command('call setqflist({!s})'.format(qflist))
+            self.command('copen')
 
     def lazy_display_error(self, filename):
         """Display error when user is over it."""
+        if not self._errors:
+            return
         position = self.cursor()
+        # The autocmd's filename may be relative to Vim's cwd, not ours
         error = self.get_error_at(position)
         if error:
             report = error.get_truncated_message(position, self.width() - 1)
             self.raw_message(report)
 
     def get_error_at(self, cursor):
-        """Return error at position `cursor`."""
-        for error in self._errors:
-            if error.includes(self._vim.eval("expand('%:p')"), cursor):
-                return error
-        return None
+        """Return error at position `cursor` in the current buffer."""
+        return self._errors.at(self.path(), cursor[0], cursor[1])
 
     def clean_errors(self):
         """Clean errors and unhighlight them in vim."""
-        self._vim.eval('clearmatches()')
-        self._errors = []
-        self._matches = []
+        if self.isneovim:
+            self._vim.api.buf_clear_namespace(0, self.__highlight_namespace(), 0, -1)
+        else:
+            self._vim.eval('clearmatches()')
+        self._errors.clear()
+        self._matches = {}
         # Reset Syntastic notes - TODO: bufdo?
         self._vim.current.buffer.vars['ensime_scala_notes'] = []
 
@@ -309,7 +443,7 @@ class Editor(object):
         cmd = 'echo "{}"'.format(message.replace('"', '\\"'))
         if silent:
             cmd = 'silent ' + cmd
-        self._vim.command(cmd)
+        self.command(cmd)
 
     def symbol_for_inspector_line(self, lineno):
         """Given a line number for the Package Inspector window, returns the
@@ -351,9 +485,9 @@ class Editor(object):
         self._vim.options['updatetime'] = 1000
         # Keys with no effect, just retrigger CursorHold
         # http://vim.wikia.com/wiki/Timer_to_execute_commands_periodically
-        #self._vim.command(r'call feedkeys("f\e")')
+        #self.command(r'call feedkeys("f\e")')
         #- change the key sequence to resolve the conflict of my key mapping
-        self._vim.command(r'call feedkeys("q\e")')
+        self.command(r'call feedkeys("q\e")')
 
     def display_notes(self, notes):
         """Renders "notes" reported by ENSIME, such as typecheck errors."""
@@ -363,10 +497,13 @@ class Editor(object):
 
         if hassyntastic:
             self.__display_notes_with_syntastic(notes)
-        else:
-            self.__display_notes(notes)
+            self.command('redraw!')
+            return
 
-        self._vim.command('redraw!')
+        # Deleted highlights and the redraw go together
+        with self.batch():
+            if self.__display_notes(notes):
+                self.command('redraw')
 
     def __display_notes_with_syntastic(self, notes):
 
@@ -393,21 +530,218 @@ class Editor(object):
                 bufvars['ensime_scala_notes'] = []
 
             bufvars['ensime_scala_notes'] += loclist
-            self._vim.command('silent! SyntasticCheck ensime')
+            self.command('silent! SyntasticCheck ensime')
+
+    def highlight_notes(self, notes, budget, chunk=50):
+        """Highlights notes for the current file, keeping earlier highlights.
+
+        Used to show notes while a typecheck is still running, before
+        :meth:`display_notes` renders the full results. Notes in the visible
+        part of the window go first, in chunks of Vim calls, until ``budget``
+        seconds have passed.
+
+        Returns:
+            list: The notes that are left to highlight.
+        """
+        deadline = time.time() + budget
+        hassyntastic, top, bottom = self._vim.eval(
+            '[exists(":SyntasticCheck"), line("w0"), line("w$")]')
+        if int(hassyntastic):
+            return []  # Syntastic shows the complete results only
+
+        current_file = self.path()
+        notes = [n for n in notes if current_file == path.abspath(n['file'])]
+        notes.sort(key=lambda n: not int(top) <= n['line'] <= int(bottom))
+
+        added = False
+        for start in range(0, len(notes), chunk):
+            if added and time.time() >= deadline:
+                break
+            batch = notes[start:start + chunk]
+            for note in batch:
+                self._errors.add(self.__note_error(note))
+            spans = [self.__note_span(note) for note in batch]
+            added = bool(self.__add_matches(spans)) or added
+        else:
+            start = len(notes)
+
+        if added:
+            self.command('redraw')
+        return notes[start:]
+
+    @staticmethod
+    def __note_span(note):
+        """``(line, start col, end col)`` highlighted for a note."""
+        return (note['line'],
+                note['col'] - 1,
+                note['col'] + (note['end'] - note['beg'] + 1))
+
+    def __note_error(self, note):
+        return Error(note['file'], note['msg'], *self.__note_span(note))
+
+    def __highlight_namespace(self):
+        if self._namespace is None:
+            self._namespace = self._vim.api.create_namespace('ensime')
+        return self._namespace
+
+    def __add_matches(self, spans, replace=False):
+        """Highlight spans that aren't highlighted yet, in one Vim call.
+
+        Args:
+            replace (bool): Whether to first remove all current highlights.
+
+        Returns:
+            list: The spans that were added.
+        """
+        if replace:
+            self._matches = {}
+        added = sorted(set(spans).difference(self._matches))
+        if self.isneovim:
+            if added or replace:
+                self.__add_highlights(added, replace)
+                self._matches.update((span, None) for span in added)
+        elif added:
+            highlight_cmd = r"matchadd('EnErrorStyle', '\\%{}l\\%>{}c\\%<{}c')"
+            ids = self._vim.eval('[{}]'.format(', '.join(
+                highlight_cmd.format(*span) for span in added)))
+            self._matches.update(zip(added, ids))
+        return added
+
+    def __add_highlights(self, spans, replace):
+        """Neovim backend of :meth:`__add_matches`.
+
+        Highlights are kept in a namespace of the current buffer rather than
+        as window matches, so they're cheap to redraw. They can't be removed
+        one by one, but clearing all of them is a single call too.
+        """
+        ns = self.__highlight_namespace()
+        calls = []
+        if replace:
+            calls.append(['nvim_buf_clear_namespace', [0, ns, 0, -1]])
+        for line, start, end in spans:
+            calls.append(['nvim_buf_add_highlight',
+                          [0, ns, 'EnErrorStyle', line - 1, start, end - 1]])
+
+        if self.virtual_text:
+            current_file = path.abspath(self.path())
+            for line in sorted(set(span[0] for span in spans)):
+                errors = self._errors.on_line(current_file, line)
+                if errors:
+                    chunks = [[errors[0].message, 'Comment']]
+                    calls.append(['nvim_buf_set_virtual_text', [0, ns, line - 1, chunks, {}]])
+
+        _, error = self._vim.api.call_atomic(calls)
+        if error:
+            raise RuntimeError('{}: {}'.format(calls[error[0]][0], error[2]))
 
     def __display_notes(self, notes):
+        """Highlight notes for the current file, replacing earlier ones.
+
+        Only highlights that changed since the last call are added or deleted,
+        with one Vim call for each, so an unchanged note costs nothing.
+
+        Returns:
+            bool: Whether any highlight changed.
+        """
         current_file = self.path()
-        highlight_cmd = r"matchadd('EnErrorStyle', '\\%{}l\\%>{}c\\%<{}c')"
+        notes = [n for n in notes if current_file == path.abspath(n['file'])]
+        wanted = set(self.__note_span(note) for note in notes)
 
+        removed = [span for span in self._matches if span not in wanted]
+        if removed and not self.isneovim:
+            # The user may have cleared matches behind our back
+            self.command(' | '.join(
+                'silent! call matchdelete({})'.format(self._matches.pop(span))
+                for span in removed))
+
+        self._errors.clear(current_file)
         for note in notes:
-            l = note['line']
-            c = note['col'] - 1
-            e = note['col'] + (note['end'] - note['beg'] + 1)
-
-            if current_file == path.abspath(note['file']):
-                error = Error(note['file'], note['msg'], l, c, e)
-                match = self._vim.eval(highlight_cmd.format(l, c, e))
-                self._errors.append(error)
-                self._matches.append(match)
-                # add_match_msg = "added match {} at line {} column {} error {}"
-                # self.log.debug(add_match_msg.format(match, l, c, e))
+            self._errors.add(self.__note_error(note))
+        # Namespaced highlights are all replaced at once instead
+        added = self.__add_matches(wanted, replace=bool(removed) and self.isneovim)
+
+        return bool(removed or added)
+
+
+def vim_string(text):
+    """Quote text as a Vim single-quoted string literal."""
+    return "'{}'".format(text.replace("'", "''"))
+
+
+# Characters of Scala operator identifiers, save for Unicode math symbols
+OPERATOR_CHARS = frozenset('!#%&*+-/:<=>?@\\^|~')
+
+
+def _is_alphanumeric(char):
+    return char.isalnum() or char in '_$'
+
+
+def _is_operator(char):
+    return char in OPERATOR_CHARS
+
+
+def _backticked_bounds(line, col):
+    """Columns of the backticks around ``col``, or ``None``."""
+    ticks = [i for i, char in enumerate(line) if char == '`']
+    for start, end in zip(ticks[::2], ticks[1::2]):
+        if start <= col <= end:
+            return start, end
+    return None
+
+
+def _char_col(line, col):
+    """Column in characters of a column in bytes, for a decoded line."""
+    if isinstance(line, bytes):
+        return col
+    return len(line.encode('utf-8')[:col].decode('utf-8', 'ignore'))
+
+
+def _byte_col(line, col):
+    """Column in bytes of a column in characters, for a decoded line."""
+    if isinstance(line, bytes):
+        return col
+    return len(line[:col].encode('utf-8'))
+
+
+def symbol_bounds(line, col):
+    """Find the Scala identifier at a column of a line.
+
+    Knows plain identifiers like ``foldLeft``, operators like ``++=``, mixed
+    ones like ``unary_!`` and backticked ones. If ``col`` isn't on an
+    identifier, the next one on the line is found instead.
+
+    Args:
+        line (str): Text of the line.
+        col (int): 0-based column.
+
+    Returns:
+        Tuple[int, int]: 0-based columns of the first and last characters of
+        the identifier, ``(col, col)`` if there is none.
+    """
+    backticked = _backticked_bounds(line, col)
+    if backticked:
+        return backticked
+
+    start = col
+    while start < len(line) and not (_is_alphanumeric(line[start]) or
+                                     _is_operator(line[start])):
+        start += 1
+    if start >= len(line):
+        return col, col
+
+    kind = _is_alphanumeric if _is_alphanumeric(line[start]) else _is_operator
+    end = start
+    while start > 0 and kind(line[start - 1]):
+        start -= 1
+    while end + 1 < len(line) and kind(line[end + 1]):
+        end += 1
+
+    # An alphanumeric identifier can end with an underscore and operator
+    if kind is _is_alphanumeric and line[end] == '_':
+        while end + 1 < len(line) and _is_operator(line[end + 1]):
+            end += 1
+    elif kind is _is_operator and start > 0 and line[start - 1] == '_':
+        start -= 1
+        while start > 0 and _is_alphanumeric(line[start - 1]):
+            start -= 1
+    return start, end
@@ -6,6 +6,7 @@ from .client import EnsimeClientV1, EnsimeClientV2
 from .config import ProjectConfig
 from .editor import Editor
 from .launcher import EnsimeLauncher
+from .receiver import WebsocketReceiver
 
 
 def execute_with_client(quiet=False,
@@ -41,6 +42,9 @@ class Ensime(object):
         clients (Mapping[str, EnsimeClient]):
             Active client instances, keyed by the filesystem path to the
             ``.ensime`` configuration for their respective projects.
+        receiver (WebsocketReceiver):
+            Single I/O thread receiving from the websockets of all clients,
+            started along with the first client.
     """
 
     def __init__(self, vim):
@@ -49,11 +53,24 @@ class Ensime(object):
         # defined.
         self._vim = vim
         self.clients = {}
+        self.receiver = None
 
     def using_server_v2(self):
         """Whether user has configured the plugin to use ENSIME v2 protocol."""
         return bool(self.get_setting('server_v2', 0))
 
+    def transport(self):
+        """Websocket transport the user has configured, ``thread`` or ``asyncio``."""
+        return self.get_setting('transport', 'thread')
+
+    def typecheck_budget(self):
+        """Seconds to spend highlighting each batch of typecheck notes."""
+        return int(self.get_setting('typecheck_budget', 20)) / 1000.0
+
+    def typecheck_debounce(self):
+        """Seconds to wait after edits before typechecking as you type, or 0."""
+        return int(self.get_setting('typecheck_as_you_type', 0)) / 1000.0
+
     def get_setting(self, key, default):
         """Returns the value of a Vim variable ``g:ensime_{key}``
         if it is set, and ``default`` otherwise.
@@ -79,6 +96,9 @@ class Ensime(object):
         """Say goodbye..."""
         for c in self.clients.values():
             c.teardown()
+        if self.receiver:
+            self.receiver.shutdown()
+            self.receiver = None
 
     def current_client(self, quiet, bootstrap_server, create_client):
         """Return the client for current file in the editor."""
@@ -110,12 +130,19 @@ class Ensime(object):
         This will launch the ENSIME server for the project as a side effect.
         """
         server_v2 = self.using_server_v2()
+        if not self.receiver:
+            self.receiver = WebsocketReceiver()
         editor = Editor(self._vim)
+        editor.virtual_text = bool(self.get_setting('virtual_text', 0))
         launcher = EnsimeLauncher(self._vim, config_path, server_v2)
+        transport = self.transport()
         if server_v2:
-            return EnsimeClientV2(editor, self._vim, launcher)
+            client = EnsimeClientV2(editor, self._vim, launcher, transport, self.receiver)
         else:
-            return EnsimeClientV1(editor, self._vim, launcher)
+            client = EnsimeClientV1(editor, self._vim, launcher, transport, self.receiver)
+        client.typecheck_budget = self.typecheck_budget()
+        client.typecheck_debounce = self.typecheck_debounce()
+        return client
 
     @execute_with_client()
     def com_en_toggle_teardown(self, client, args, range=None):
@@ -125,6 +152,18 @@ class Ensime(object):
     def com_en_type_check(self, client, args, range=None):
         client.type_check_cmd(None)
 
+    @execute_with_client()
+    def com_en_diagnostics(self, client, args, range=None):
+        client.show_diagnostics()
+
+    @execute_with_client()
+    def com_en_server_stats(self, client, args, range=None):
+        client.server_stats(args, range)
+
+    @execute_with_client()
+    def com_en_startup_profile(self, client, args, range=None):
+        client.startup_profile(args, range)
+
     @execute_with_client()
     def com_en_type(self, client, args, range=None):
         client.type(None)
@@ -247,6 +286,10 @@ class Ensime(object):
     def au_vim_leave(self, client, filename):
         self.teardown()
 
+    @execute_with_client()
+    def au_buf_enter(self, client, filename):
+        client.buffer_enter(filename)
+
     @execute_with_client()
     def au_buf_leave(self, client, filename):
         client.buffer_leave(filename)
@@ -259,6 +302,10 @@ class Ensime(object):
     def au_cursor_moved(self, client, filename):
         client.on_cursor_move(filename)
 
+    @execute_with_client(quiet=True)
+    def au_text_changed(self, client, filename):
+        client.on_text_changed(filename)
+
     @execute_with_client()
     def fun_en_complete_func(self, client, findstart_and_base, base=None):
         """Invokable function from vim and neovim to perform completion."""
@@ -7,28 +7,42 @@ import shutil
 import signal
 import socket
 import subprocess
+import sys
+import threading
 import time
-
 from string import Template
 
 from ensime_shared.config import BOOTSTRAPS_ROOT, ProjectConfig
 from ensime_shared.errors import InvalidJavaPathError
+from ensime_shared.startup import StartupProfile
 from ensime_shared.util import catch, Util
 
 
 class EnsimeProcess(object):
-
-    def __init__(self, cache_dir, process, log_path, cleanup):
+    """A server process, either launched by us or found running.
+
+    Args:
+        cache_dir (str): The project's cache dir, used by the server.
+        process (Optional[subprocess.Popen]): The launched server.
+        log_path (Optional[str]): Where the server logs.
+        cleanup (Callable[[], None]): Called once the server is stopped.
+        pid (Optional[int]): Process id of a server found running, see
+            :meth:`EnsimeLauncher.attach`.
+    """
+
+    def __init__(self, cache_dir, process, log_path, cleanup, pid=None):
         self.log_path = log_path
         self.cache_dir = cache_dir
         self.process = process
+        self.pid = process.pid if process else pid
         self.__stopped_manually = False
         self.__cleanup = cleanup
 
     def stop(self):
-        if self.process is None:
+        if self.pid is None:
             return
-        os.kill(self.process.pid, signal.SIGTERM)
+        with catch(OSError):  # A server found running may be gone already
+            os.kill(self.pid, signal.SIGTERM)
         self.__cleanup()
         self.__stopped_manually = True
 
@@ -36,7 +50,11 @@ class EnsimeProcess(object):
         return not (self.__stopped_manually or self.is_running())
 
     def is_running(self):
-        return self.process is None or self.process.poll() is None
+        if self.process is not None:
+            return self.process.poll() is None
+        if self.pid is not None:
+            return os.path.exists('/proc/{}'.format(self.pid))
+        return True
 
     def is_ready(self):
         if not self.is_running():
@@ -54,6 +72,60 @@ class EnsimeProcess(object):
         return int(Util.read_file(os.path.join(self.cache_dir, "http")))
 
 
+class ClasspathBootstrap(object):
+    """A command run in the background to install the server.
+
+    Output is read in a daemon thread and passed line by line to
+    ``on_output``, then ``on_done`` gets the exit status of the command.
+    The status is what tells whether the install worked, so concurrent
+    installs don't share any file to report it.
+
+    Args:
+        args (List[str]): Command to run.
+        cwd (str): Directory to run it from.
+        on_output (Callable[[str], None]): Called with each line of output.
+        on_done (Callable[[int], None]): Called with the exit status.
+    """
+
+    def __init__(self, args, cwd, on_output, on_done):
+        self.args = args
+        self.cwd = cwd
+        self.on_output = on_output
+        self.on_done = on_done
+        self.process = None
+        self.running = False
+
+    def start(self):
+        """Start the command, raising ``OSError`` if it can't be run."""
+        with open(os.devnull, "r") as null:
+            self.process = subprocess.Popen(
+                self.args,
+                cwd=self.cwd,
+                stdin=null,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT)
+        self.running = True
+        reader = threading.Thread(target=self._read, name='ensime-bootstrap')
+        reader.daemon = True
+        reader.start()
+
+    def stop(self):
+        """Kill the command if it's still running."""
+        if self.running:
+            with catch(OSError):
+                self.process.kill()
+
+    def _read(self):
+        for line in iter(self.process.stdout.readline, b''):
+            if sys.version_info > (3, 0):
+                line = line.decode('utf-8', 'replace')
+            self.on_output(line.rstrip())
+        self.process.stdout.close()
+        returncode = self.process.wait()
+        self.running = False
+        self.on_done(returncode)
+
+
 class EnsimeLauncher(object):
     ENSIME_V1 = '1.0.0'
     ENSIME_V2 = '2.0.0-SNAPSHOT'
@@ -64,7 +136,12 @@ class EnsimeLauncher(object):
         self.server_v2 = server_v2
         self.ensime_version = self.ENSIME_V2 if server_v2 else self.ENSIME_V1
         self._config_path = os.path.abspath(config_path)
+        started = time.time()
         self.config = ProjectConfig(self._config_path)
+        # Part of the first startup profiled, see launch()
+        self._config_seconds = time.time() - started
+        self.profile = StartupProfile(
+            os.path.join(self.config['cache-dir'], 'ensime-vim-startup.json'))
         self.base_dir = os.path.abspath(base_dir)
         self.classpath_file = os.path.join(self.base_dir,
                                            self.config['scala-version'],
@@ -72,18 +149,74 @@ class EnsimeLauncher(object):
         self._migrate_legacy_bootstrap_location()
 
     def launch(self):
-        cache_dir = self.config['cache-dir'],
-        process = EnsimeProcess(cache_dir, None, None, lambda: None)
-        if process.is_ready():
+        launched = time.time()
+        process = self.attach()
+        if process:
+            self._start_profile(launched)
+            self.profile.mark('attach')
             return process
 
         classpath = self.load_classpath()
-        return self.start_process(classpath) if classpath else None
+        if not classpath:
+            return None
+        self._start_profile(launched)
+        self.profile.mark('classpath')
+        process = self.start_process(classpath)
+        self.profile.mark('spawn')
+        return process
+
+    def _start_profile(self, launched):
+        """Time a startup in :attr:`profile`, now that there is a server.
+
+        The config was parsed when the launcher was created, which can be
+        long before, so that time is counted as if just before the launch.
+        """
+        if self._config_seconds is None:
+            self.profile.start(launched)
+            return
+        self.profile.start(launched - self._config_seconds)
+        self.profile.mark('config', launched)
+        self._config_seconds = None  # Only parsed for the first startup
+
+    def attach(self):
+        """Find a server left running for the project by an earlier session.
+
+        The process in ``server.pid`` must be alive, have been launched for
+        this project's config and answer on the port in the ``http`` file.
+        Processes are looked up in ``/proc``, so this only finds servers on
+        Linux.
+
+        Returns:
+            Optional[EnsimeProcess]: The running server, or ``None``.
+        """
+        cache_dir = self.config['cache-dir']
+        pid_path = os.path.join(cache_dir, "server.pid")
+        config_path = self._config_path
+        try:
+            pid = int(Util.read_file(pid_path))
+            with open('/proc/{}/cmdline'.format(pid), 'rb') as f:
+                args = f.read().split(b'\0')
+            # Compared as bytes, a Python 2 str path already is
+            if not isinstance(config_path, bytes):
+                config_path = config_path.encode(sys.getfilesystemencoding() or 'utf-8')
+        except (IOError, OSError, ValueError):  # UnicodeError is a ValueError
+            return None
+
+        # The pid may have been reused by another process since
+        if b'-Densime.config=' + config_path not in args:
+            return None
+
+        def on_stop():
+            with catch(Exception, lambda e: None):
+                os.remove(pid_path)
+
+        log_path = os.path.join(cache_dir, "server.log")
+        process = EnsimeProcess(cache_dir, None, log_path, on_stop, pid=pid)
+        return process if process.is_ready() else None
 
     def load_classpath(self):
         if not os.path.exists(self.classpath_file):
-            if not self.generate_classpath():
-                return None
+            return None
 
         classpath = "{}:{}/lib/tools.jar".format(
             Util.read_file(self.classpath_file), self.config['java-home'])
@@ -133,7 +266,21 @@ class EnsimeLauncher(object):
 
         return EnsimeProcess(cache_dir, process, log_path, on_stop)
 
-    def generate_classpath(self):
+    def generate_classpath(self, on_output, on_done):
+        """Start installing the server, saving its classpath with sbt.
+
+        sbt runs in the background: its output is passed line by line to
+        ``on_output`` and ``on_done`` is called with whether the classpath was
+        saved, both from the thread reading the output.
+
+        Args:
+            on_output (Callable[[str], None]): Called with each line of output.
+            on_done (Callable[[bool], None]): Called once sbt has exited.
+
+        Returns:
+            Optional[ClasspathBootstrap]: The running bootstrap, or ``None`` if
+            sbt could not be started.
+        """
         project_dir = os.path.dirname(self.classpath_file)
         Util.mkdir_p(project_dir)
         Util.mkdir_p(os.path.join(project_dir, "project"))
@@ -147,47 +294,21 @@ class EnsimeLauncher(object):
             os.path.join(project_dir, "project", "plugins.sbt"),
             """addSbtPlugin("io.get-coursier" % "sbt-coursier" % "1.0.0-M11")""")
 
-        # Synchronous update of the classpath via sbt
-        # see https://github.com/ensime/ensime-vim/issues/29
-        cd_cmd = "cd {}".format(project_dir)
-        sbt_cmd = "sbt -Dsbt.log.noformat=true -batch saveClasspath"
-        inside_nvim = int(self.vim.eval("has('nvim')"))
-        if inside_nvim:
-            import tempfile
-            import re
-            tmp_dir = tempfile.gettempdir()
-            flag_file = "{}/ensime-vim-classpath.flag".format(tmp_dir)
-            self.vim.command("echo 'Waiting for generation of classpath...'")
-            if re.match(".+fish$", self.vim.eval("&shell")):
-                sbt_cmd += "; echo $status > {}".format(flag_file)
-                self.vim.command("terminal {}; and {}".format(cd_cmd, sbt_cmd))
-            else:
-                sbt_cmd += "; echo $? > {}".format(flag_file)
-                self.vim.command("terminal ({} && {})".format(cd_cmd, sbt_cmd))
-
-            # Block execution when sbt is run
-            waiting_for_flag = True
-            while waiting_for_flag:
-                waiting_for_flag = not os.path.isfile(flag_file)
-                if not waiting_for_flag:
-                    with open(flag_file, "r") as f:
-                        rtcode = f.readline()
-                    os.remove(flag_file)
-                    if rtcode and int(rtcode) != 0:  # error
-                        self.vim.command(
-                            "echo 'Something wrong happened, check the "
-                            "execution log...'")
-                        return None
-                else:
-                    time.sleep(0.2)
-        else:
-            self.vim.command("!({} && {})".format(cd_cmd, sbt_cmd))
-
-        success = self.reorder_classpath(self.classpath_file)
-        if not success:
-            self.vim.command("echo 'Classpath ordering failed.'")
+        def done(returncode):
+            success = returncode == 0 and os.path.exists(self.classpath_file)
+            if success and not self.reorder_classpath(self.classpath_file):
+                on_output('Classpath ordering failed.')
+            on_done(success)
 
-        return True
+        # Run in the background, see https://github.com/ensime/ensime-vim/issues/29
+        bootstrap = ClasspathBootstrap(
+            ['sbt', '-Dsbt.log.noformat=true', '-batch', 'saveClasspath'],
+            project_dir, on_output, done)
+        try:
+            bootstrap.start()
+        except OSError:
+            return None
+        return bootstrap
 
     def build_sbt(self):
         src = r"""
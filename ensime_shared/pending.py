@@ -0,0 +1,129 @@
+# coding: utf-8
+
+from threading import Event, Lock
+
+
+class PendingCall(object):
+    """The future response to a request that a caller is waiting on.
+
+    Args:
+        call_id (int): ``callId`` of the request.
+    """
+
+    def __init__(self, call_id):
+        self.call_id = call_id
+        self.response = None
+        self._event = Event()
+
+    def set(self, response):
+        """Resolve the call with a response, waking up the waiter."""
+        self.response = response
+        self._event.set()
+
+    def done(self):
+        """bool: Whether the response has arrived."""
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the response arrives or ``timeout`` seconds elapse.
+
+        Returns:
+            bool: Whether the response arrived.
+        """
+        return self._event.wait(timeout)
+
+
+class PendingCalls(object):
+    """Thread-safe table of :class:`PendingCall` keyed by ``callId``.
+
+    Responses are resolved from the receiver thread while callers wait on the
+    main thread, so a call is only ever resolved while it is still in the
+    table: once :meth:`discard` returns, a late response is not claimed and
+    takes the normal dispatch path instead.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = Lock()
+
+    def __contains__(self, call_id):
+        with self._lock:
+            return call_id in self._calls
+
+    def expect(self, call_id):
+        """Register interest in the response to ``call_id``.
+
+        Returns:
+            PendingCall
+        """
+        call = PendingCall(call_id)
+        with self._lock:
+            self._calls[call_id] = call
+        return call
+
+    def get(self, call_id):
+        """Return the :class:`PendingCall` for ``call_id``, or ``None``."""
+        with self._lock:
+            return self._calls.get(call_id)
+
+    def resolve(self, call_id, response):
+        """Hand a response to its waiter, if anyone is waiting for it.
+
+        Returns:
+            bool: Whether the response was claimed by a pending call.
+        """
+        with self._lock:
+            call = self._calls.get(call_id)
+            if call is None or call.done():
+                return False
+            call.set(response)
+            return True
+
+    def discard(self, call_id):
+        """Stop waiting for ``call_id``, returning its call if it was pending."""
+        with self._lock:
+            return self._calls.pop(call_id, None)
+
+
+class Generations(object):
+    """Tracks the latest call of each kind of interactive request.
+
+    Sending a request of a tracked kind supersedes the previous call of that
+    kind if it's still unanswered: its response is stale by the time it
+    arrives, e.g. a completion for a prefix the user has typed past.
+
+    Args:
+        kinds (Iterable[str]): Request typehints to track.
+    """
+
+    def __init__(self, kinds):
+        self.kinds = frozenset(kinds)
+        self._latest = {}  # kind -> call ID
+        self._stale = set()
+        self._lock = Lock()
+
+    def started(self, kind, call_id):
+        """Record that a request was sent, superseding older ones of its kind."""
+        if kind not in self.kinds:
+            return
+        with self._lock:
+            previous = self._latest.get(kind)
+            if previous is not None:
+                self._stale.add(previous)
+            self._latest[kind] = call_id
+
+    def answered(self, call_id):
+        """Record a response to ``call_id``.
+
+        Returns:
+            bool: Whether the response is stale and should be dropped.
+        """
+        with self._lock:
+            if call_id in self._stale:
+                self._stale.remove(call_id)
+                return True
+            for kind, latest in self._latest.items():
+                if latest == call_id:
+                    del self._latest[kind]
+                    break
+            return False
@@ -24,9 +24,11 @@ class ProtocolHandler(object):
         A handler must accept only one parameter: `payload`.
         """
         self.handlers["SymbolInfo"] = self.handle_symbol_info
+        self.handlers["ConnectionInfo"] = self.handle_connection_info
         self.handlers["IndexerReadyEvent"] = self.handle_indexer_ready
         self.handlers["AnalyzerReadyEvent"] = self.handle_analyzer_ready
         self.handlers["NewScalaNotesEvent"] = self.buffer_typechecks
+        self.handlers["ClearAllScalaNotesEvent"] = self.clear_notes
         self.handlers["BasicTypeInfo"] = self.show_type
         self.handlers["ArrowTypeInfo"] = self.show_type
         self.handlers["FullTypeCheckCompleteEvent"] = self.handle_typecheck_complete
@@ -60,6 +62,9 @@ class ProtocolHandler(object):
         else:
             self.log.warning('Response has not been handled: %s', Pretty(payload))
 
+    def handle_connection_info(self, call_id, payload):
+        raise NotImplementedError()
+
     def handle_indexer_ready(self, call_id, payload):
         raise NotImplementedError()
 
@@ -97,10 +102,15 @@ class ProtocolHandler(object):
 class ProtocolHandlerV1(ProtocolHandler):
     """Implements response handlers for the v1 ENSIME Jerky protocol."""
 
+    def handle_connection_info(self, call_id, payload):
+        self.launcher.profile.mark('connection_info')
+
     def handle_indexer_ready(self, call_id, payload):
+        self.launcher.profile.mark('indexer')
         self.editor.message("indexer_ready")
 
     def handle_analyzer_ready(self, call_id, payload):
+        self.launcher.profile.mark('analyzer')
         self.editor.message("analyzer_ready")
 
     def handle_debug_vm_error(self, call_id, payload):
@@ -128,7 +138,7 @@ class ProtocolHandlerV1(ProtocolHandler):
             indent = "  " * indentLevel
             t = member["declAs"]["typehint"] if member["typehint"] == "BasicTypeInfo" else ""
             line = "{}{}: {}".format(indent, t, member["name"])
-            self.editor.append(line)
+            lines.append(line)
             if indentLevel < 4:
                 for m in member["members"]:
                     add(m, indentLevel + 1)
@@ -138,9 +148,11 @@ class ProtocolHandlerV1(ProtocolHandler):
                 'filetype': 'package_info', 'swapfile': False}
         self.editor.split_window('package_info', vertical=True, size=45, bufopts=opts)
 
-        self.editor.append(str(package))
+        lines = [str(package)]
         for member in payload["members"]:
             add(member, 1)
+        # All at once, each call is a round trip to Neovim
+        self.editor.append(lines)
 
     def handle_symbol_search(self, call_id, payload):
         """Handler for symbol search results"""
@@ -230,6 +242,11 @@ class ProtocolHandlerV1(ProtocolHandler):
     def handle_completion_info_list(self, call_id, payload):
         """Handler for a completion response."""
         self.log.debug('handle_completion_info_list: in')
+        session = self.completion_session
+        if session and session.call_id == call_id:
+            # Ranked and formatted on demand by complete_func
+            session.update(payload["completions"])
+            return
         # filter out completions without `typeInfo` field to avoid server bug. See #324
         completions = [c for c in payload["completions"] if "typeInfo" in c]
         self.suggestions = [completion_to_suggest(c) for c in completions]
@@ -0,0 +1,139 @@
+# coding: utf-8
+
+import errno
+import logging
+import os
+import select
+from threading import Lock, Thread
+
+
+class WebsocketReceiver(object):
+    """Receives frames from websockets on a background thread.
+
+    Instead of polling on an interval, the thread blocks in ``select`` on the
+    watched sockets together with the read end of a self-pipe. Frames are
+    handed to their socket's ``on_message`` callback as soon as they arrive.
+    Writing to the pipe wakes the thread up, which is how changes to the set
+    of watched sockets take effect and how :meth:`shutdown` interrupts a
+    blocked receive.
+
+    Args:
+        logger (Optional[logging.Logger]): Where to log receive errors.
+    """
+
+    def __init__(self, logger=None):
+        self.log = logger or logging.getLogger(__name__)
+        self._sockets = {}  # fileno -> (ws, on_message, on_error)
+        self._lock = Lock()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        self._running = True
+
+        self._thread = Thread(name='websocket-receiver', target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def running(self):
+        """bool: Whether the receiver thread has not been shut down."""
+        return self._running
+
+    def register(self, ws, on_message, on_error):
+        """Start delivering frames received on a websocket.
+
+        Args:
+            ws: A connected ``websocket.WebSocket``.
+            on_message (Callable[[str], None]): Called with each frame, on the
+                receiver thread.
+            on_error (Callable[[Exception], None]): Called on the receiver
+                thread if receiving fails. The socket is no longer watched
+                after that.
+        """
+        with self._lock:
+            self._sockets[ws.fileno()] = (ws, on_message, on_error)
+        self._wakeup()
+
+    def unregister(self, ws):
+        """Stop watching a websocket. Unknown sockets are ignored."""
+        with self._lock:
+            for fd, entry in list(self._sockets.items()):
+                if entry[0] is ws:
+                    del self._sockets[fd]
+        self._wakeup()
+
+    def shutdown(self):
+        """Stop the receiver thread, waking it up if it's blocked."""
+        if not self._running:
+            return
+        self._running = False
+        with self._lock:
+            self._sockets.clear()
+        self._wakeup()
+
+    def _wakeup(self):
+        with self._lock:
+            if self._wakeup_w is not None:
+                os.write(self._wakeup_w, b'x')
+
+    def _run(self):
+        while self._running:
+            with self._lock:
+                watched = dict(self._sockets)
+
+            try:
+                readable, _, _ = select.select([self._wakeup_r] + list(watched), [], [])
+            except (select.error, OSError, ValueError) as e:
+                if e.args and e.args[0] == errno.EINTR:
+                    continue
+                # A socket got closed under our feet, drop whatever is dead
+                self.log.debug('receiver: select failed, pruning sockets', exc_info=True)
+                self._prune(watched)
+                continue
+
+            if self._wakeup_r in readable:
+                os.read(self._wakeup_r, 4096)
+
+            for fd in readable:
+                if fd in watched and self._is_watched(fd, watched[fd][0]):
+                    self._receive(fd, *watched[fd])
+
+        with self._lock:
+            os.close(self._wakeup_r)
+            os.close(self._wakeup_w)
+            self._wakeup_w = None
+
+    def _is_watched(self, fd, ws):
+        with self._lock:
+            entry = self._sockets.get(fd)
+        return entry is not None and entry[0] is ws
+
+    def _forget(self, fd, ws):
+        """Stop watching a socket, unless it already was unregistered.
+
+        Returns:
+            bool: Whether it was still watched, so its errors are worth
+            reporting.
+        """
+        with self._lock:
+            entry = self._sockets.get(fd)
+            if entry is None or entry[0] is not ws:
+                return False
+            del self._sockets[fd]
+        return True
+
+    def _receive(self, fd, ws, on_message, on_error):
+        try:
+            frame = ws.recv()
+        except Exception as e:  # websocket-client doesn't have a common base
+            if self._forget(fd, ws):
+                on_error(e)
+        else:
+            on_message(frame)
+
+    def _prune(self, watched):
+        # Sockets unregistered since the snapshot are expected to be closed
+        for fd, (ws, _, on_error) in watched.items():
+            try:
+                select.select([fd], [], [], 0)
+            except (select.error, OSError, ValueError) as e:
+                if self._forget(fd, ws):
+                    on_error(e)
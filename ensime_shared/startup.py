@@ -0,0 +1,124 @@
+# coding: utf-8
+
+"""
+Timings of the phases of server startup, from reading the project config to
+the analyzer being ready, kept in the project's cache dir.
+"""
+
+import json
+import os
+import time
+from threading import Lock
+
+PHASES = (
+    ('config', 'Project config parsed'),
+    ('attach', 'Running server found'),
+    ('classpath', 'Classpath loaded'),
+    ('spawn', 'JVM spawned'),
+    ('port', 'Server listening on its port'),
+    ('connect', 'Websocket connected'),
+    ('connection_info', 'ConnectionInfoReq answered'),
+    ('indexer', 'Indexer ready'),
+    ('analyzer', 'Analyzer ready'),
+)
+"""Phases a startup goes through, in order, with their descriptions.
+
+Attaching to a running server skips the classpath and spawn phases.
+"""
+
+
+class StartupProfile(object):
+    """Records when each phase of a startup is reached.
+
+    Nothing is recorded until a startup is begun with :meth:`start`. Each
+    phase is then timed from the start, the first time it's reached. The
+    timings are written to a JSON file as they come, together with those of
+    a few earlier startups. Phases can be marked from any thread.
+
+    Args:
+        filepath (str): Path of the timings file, in the project's cache dir.
+    """
+
+    keep = 10  # Startups kept in the file
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._lock = Lock()
+        self.started = None
+        self.phases = []  # [(phase, seconds since started)]
+
+    def start(self, started=None):
+        """Begin timing a startup, like after the server died.
+
+        Args:
+            started (Optional[float]): When the startup began, as from
+                ``time.time()``. Now by default.
+        """
+        with self._lock:
+            self.started = time.time() if started is None else started
+            self.phases = []
+
+    @property
+    def done(self):
+        """bool: Whether the startup is over, with the analyzer and indexer ready."""
+        reached = set(phase for phase, _ in self.phases)
+        return {'analyzer', 'indexer'} <= reached
+
+    def mark(self, phase, when=None):
+        """Record that a phase is reached, unless it already was.
+
+        Args:
+            phase (str): One of :data:`PHASES`.
+            when (Optional[float]): When it was reached. Now by default.
+        """
+        with self._lock:
+            if self.started is None or self.done:
+                return
+            if any(name == phase for name, _ in self.phases):
+                return
+            when = time.time() if when is None else when
+            self.phases.append((phase, when - self.started))
+            self.save()
+
+    def runs(self):
+        """Startups recorded in the file, earliest first.
+
+        Returns:
+            List[dict]: The ``started`` time of each startup, and its
+            ``phases`` as pairs of a phase name and seconds since started.
+        """
+        try:
+            with open(self.filepath) as f:
+                return json.load(f)['runs']
+        except (IOError, OSError, ValueError, KeyError):
+            return []
+
+    def save(self):
+        """Write the current startup to the file, replacing it in one go.
+
+        Returns:
+            bool: Whether the file could be written.
+        """
+        runs = [run for run in self.runs() if run['started'] != self.started]
+        runs.append({'started': self.started, 'phases': self.phases})
+        tmp = self.filepath + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'runs': runs[-self.keep:]}, f, indent=1)
+            os.rename(tmp, self.filepath)
+        except (IOError, OSError):
+            return False
+        return True
+
+
+def describe(run):
+    """Lines describing the phases of a startup, as recorded by
+    :class:`StartupProfile`, with how long each one took."""
+    descriptions = dict(PHASES)
+    lines = []
+    previous = 0.0
+    for phase, at in run['phases']:
+        lines.append('{:>7.2f}s {:>+7.2f}s  {}'.format(
+            at, at - previous, descriptions.get(phase, phase)))
+        previous = at
+    return lines
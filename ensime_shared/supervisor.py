@@ -0,0 +1,181 @@
+# coding: utf-8
+
+"""
+Keep an eye on the server process: how much memory and CPU it uses, and
+whether it's still alive, launching it again if it dies.
+"""
+
+import os
+import time
+from threading import Event, Thread
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def resource_usage(pid):
+    """Resources used by a process so far, read from ``/proc``.
+
+    Args:
+        pid (int): Id of the process.
+
+    Returns:
+        Optional[Tuple[int, float]]: Resident memory in bytes and CPU time in
+        seconds, or ``None`` if the process isn't found.
+    """
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            stat = f.read()
+        with open('/proc/{}/statm'.format(pid)) as f:
+            statm = f.read()
+    except (IOError, OSError):
+        return None
+
+    # The command name may contain spaces, count fields from its end
+    fields = stat[stat.rindex(')') + 2:].split()
+    utime, stime = int(fields[11]), int(fields[12])
+    rss = int(statm.split()[1]) * PAGE_SIZE
+    return rss, float(utime + stime) / CLOCK_TICKS
+
+
+class Supervisor(object):
+    """Watches a server from a background thread, launching it again if it dies.
+
+    The server is sampled every :attr:`interval` seconds. Once it's found
+    dead without having been stopped, it's launched again after a delay
+    doubling with each restart, until it has died :attr:`max_restarts` times
+    without staying up for :attr:`stable_after` seconds in between.
+
+    Callbacks are called from the background thread.
+
+    Args:
+        process (EnsimeProcess): The server to watch.
+        launch (Callable[[], Optional[EnsimeProcess]]): Launches the server
+            again.
+        on_crash (Callable[[int, float], None]): Called when the server died,
+            with the number of the restart to come and the delay before it.
+        on_restart (Callable[[EnsimeProcess], None]): Called with the server
+            once it's launched again.
+        on_give_up (Callable[[], None]): Called if the server isn't launched
+            again.
+    """
+
+    interval = 5.0  # seconds
+    backoff = 2.0  # seconds before the first restart
+    max_backoff = 60.0
+    max_restarts = 5
+    stable_after = 300.0  # seconds
+
+    def __init__(self, process, launch, on_crash, on_restart, on_give_up):
+        self.launch = launch
+        self.on_crash = on_crash
+        self.on_restart = on_restart
+        self.on_give_up = on_give_up
+        self.restarts = 0  # In a row, see stable_after
+        self.total_restarts = 0
+        self.gave_up = False
+        self._stopped = Event()
+        self._thread = None
+        self._watch(process)
+
+    def _watch(self, process):
+        self.process = process
+        self.started = time.time()
+        self.rss = None
+        self.cpu_time = None
+        self.cpu_percent = None
+        self._sampled_at = None
+
+    def start(self):
+        self._thread = Thread(name='ensime-supervisor', target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching, the server won't be launched again."""
+        self._stopped.set()
+
+    @property
+    def active(self):
+        """bool: Whether a dead server would be launched again."""
+        return not (self._stopped.is_set() or self.gave_up)
+
+    def stats(self):
+        """Latest figures about the server.
+
+        Returns:
+            dict: The server's ``pid``, its ``uptime`` in seconds, ``rss`` in
+            bytes, ``cpu`` usage in percent over the last sampling interval,
+            ``cpu_time`` in seconds and ``restarts`` since the first launch.
+            Figures not sampled yet are ``None``.
+        """
+        return {
+            'pid': self.process.pid,
+            'uptime': time.time() - self.started,
+            'rss': self.rss,
+            'cpu': self.cpu_percent,
+            'cpu_time': self.cpu_time,
+            'restarts': self.total_restarts,
+        }
+
+    def check(self):
+        """Sample the server, launching it again if it died.
+
+        Returns:
+            bool: Whether to keep watching.
+        """
+        if self.process.aborted():
+            return self.restart()
+        self.sample()
+        if self.restarts and time.time() - self.started > self.stable_after:
+            self.restarts = 0
+        return True
+
+    def sample(self):
+        if self.process.pid is None:
+            return
+        usage = resource_usage(self.process.pid)
+        if usage is None:
+            return
+        now = time.time()
+        rss, cpu_time = usage
+        if self._sampled_at is not None and now > self._sampled_at:
+            busy = cpu_time - self.cpu_time
+            self.cpu_percent = 100.0 * busy / (now - self._sampled_at)
+        self.rss, self.cpu_time, self._sampled_at = rss, cpu_time, now
+
+    def restart(self):
+        if self.restarts >= self.max_restarts:
+            return self._give_up()
+
+        delay = min(self.backoff * 2 ** self.restarts, self.max_backoff)
+        self.restarts += 1
+        self.on_crash(self.restarts, delay)
+        if self._stopped.wait(delay):
+            return False
+
+        try:
+            process = self.launch()
+        except Exception:
+            process = None
+        if self._stopped.is_set():
+            if process:
+                process.stop()
+            return False
+        if process is None:
+            return self._give_up()
+
+        self.total_restarts += 1
+        self._watch(process)
+        self.on_restart(process)
+        return True
+
+    def _give_up(self):
+        self.gave_up = True
+        self.on_give_up()
+        return False
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            if not self.check():
+                return
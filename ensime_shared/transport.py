@@ -0,0 +1,176 @@
+# coding: utf-8
+
+"""
+An asyncio-based websocket transport, an alternative to the default of a
+blocking ``websocket-client`` connection plus a :class:`WebsocketReceiver`.
+
+Requires Python 3 and the ``websockets`` package. The code sticks to futures
+and callbacks rather than ``async`` syntax so that the module still parses
+under Python 2, where it's simply never used.
+"""
+
+import collections
+import logging
+from threading import Event, Lock, Thread
+
+from .util import module_exists
+
+
+def asyncio_available():
+    """bool: Whether the dependencies of :class:`AsyncioEngine` are installed."""
+    return module_exists('asyncio') and module_exists('websockets')
+
+
+class AsyncioEngine(object):
+    """Runs one asyncio event loop on a background thread for all connections.
+
+    Connections are cheap coroutines on the loop instead of a thread each, so
+    this scales to many open projects, and sends don't block the caller.
+
+    Use :meth:`shared` to get the engine for the process.
+    """
+
+    _shared = None
+    _shared_lock = Lock()
+
+    def __init__(self, logger=None):
+        import asyncio
+
+        self.log = logger or logging.getLogger(__name__)
+        self.loop = asyncio.new_event_loop()
+        self._thread = Thread(name='asyncio-transport', target=self._run)
+        self._thread.daemon = True
+        # Wait for the loop to run, so shared() doesn't take it for dead
+        started = Event()
+        self.loop.call_soon(started.set)
+        self._thread.start()
+        started.wait()
+
+    @classmethod
+    def shared(cls):
+        """Return the process-wide engine, starting it if needed."""
+        with cls._shared_lock:
+            if cls._shared is None or not cls._shared.loop.is_running():
+                cls._shared = cls()
+            return cls._shared
+
+    def _run(self):
+        import asyncio
+
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def connect(self, url, on_message, on_error, subprotocols=None, timeout=10):
+        """Open a websocket connection, blocking until it's established.
+
+        Args:
+            url (str): Websocket URL of the ENSIME server.
+            on_message (Callable[[str], None]): Called with each frame, on the
+                engine's thread.
+            on_error (Callable[[Exception], None]): Called on the engine's
+                thread if the connection fails after being established.
+            subprotocols (Optional[Sequence[str]]): Subprotocols to request.
+            timeout (float): Seconds to wait for the handshake.
+
+        Returns:
+            AsyncioConnection
+        """
+        import asyncio
+        import websockets
+
+        handshake = asyncio.wait_for(
+            # Responses like completions or notes can exceed the default 1 MiB
+            websockets.connect(url, subprotocols=subprotocols, max_size=None), timeout)
+        future = asyncio.run_coroutine_threadsafe(handshake, self.loop)
+        ws = future.result(timeout)
+
+        conn = AsyncioConnection(self, ws, on_message, on_error)
+        self.loop.call_soon_threadsafe(conn._receive_next)
+        return conn
+
+
+class AsyncioConnection(object):
+    """A websocket connection driven by an :class:`AsyncioEngine`.
+
+    Quacks like ``websocket.WebSocket`` for the purposes of ``EnsimeClient``:
+    :meth:`send` and :meth:`close` may be called from any thread and return
+    immediately. Messages are sent in order, pipelined behind each other
+    rather than waiting on a reply.
+
+    Args:
+        send_timeout (float): Seconds after which a stuck send is cancelled.
+    """
+
+    def __init__(self, engine, ws, on_message, on_error, send_timeout=10):
+        self.engine = engine
+        self.log = engine.log
+        self.send_timeout = send_timeout
+        self._ws = ws
+        self._on_message = on_message
+        self._on_error = on_error
+        self._outbox = collections.deque()
+        self._sending = None
+        self._receiving = None
+        self._closed = False
+
+    def send(self, msg):
+        """Schedule ``msg`` to be sent, without waiting for it."""
+        if self._closed:
+            raise IOError('Connection is closed')
+        self.engine.loop.call_soon_threadsafe(self._enqueue, msg)
+
+    def close(self):
+        """Cancel pending work and close the connection."""
+        if not self._closed:
+            self._closed = True
+            self.engine.loop.call_soon_threadsafe(self._close)
+
+    # The rest runs on the event loop thread only.
+
+    def _enqueue(self, msg):
+        self._outbox.append(msg)
+        if self._sending is None:
+            self._send_next()
+
+    def _send_next(self):
+        import asyncio
+
+        if not self._outbox or self._closed:
+            self._sending = None
+            return
+        msg = self._outbox.popleft()
+        send = asyncio.wait_for(self._ws.send(msg), self.send_timeout)
+        self._sending = self.engine.loop.create_task(send)
+        self._sending.add_done_callback(self._on_sent)
+
+    def _on_sent(self, task):
+        if not task.cancelled() and task.exception():
+            self.log.error('send failed: %r', task.exception())
+        self._send_next()
+
+    def _receive_next(self):
+        if self._closed:
+            return
+        self._receiving = self.engine.loop.create_task(self._ws.recv())
+        self._receiving.add_done_callback(self._on_received)
+
+    def _on_received(self, task):
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc:
+            self._closed = True
+            self._on_error(exc)
+            return
+        try:
+            self._on_message(task.result())
+        except Exception:
+            self.log.exception('error handling message')
+        self._receive_next()
+
+    def _close(self):
+        for task in (self._sending, self._receiving):
+            if task is not None:
+                task.cancel()
+        self._outbox.clear()
+        self.engine.loop.create_task(self._ws.close())
@@ -1,33 +1,207 @@
 # coding: utf-8
 
+import os
+import time
+from threading import Timer
+
+from .buffers import BufferSnapshot
+from .diagnostics import ProjectNotes
+
 
 class TypecheckHandler(object):
 
+    typecheck_budget = 0.02
+    """Seconds spent highlighting notes as each batch of them arrives, or 0
+    to show nothing until the typecheck is complete."""
+
+    typecheck_debounce = 0
+    """Seconds without edits after which modified buffers are typechecked in
+    the background, or 0 to only typecheck on demand."""
+
+    typecheck_timeout = 30
+    """Seconds after which a background typecheck that never completed no
+    longer holds back the next one."""
+
     def __init__(self):
         self.currently_buffering_typechecks = False
         self.buffered_notes = []
+        self.unrendered_notes = []
+        # Every note the server has reported, for any file
+        self.project_notes = ProjectNotes()
+        # Files whose notes changed since they were last cached, with the
+        # digest of the contents they were typechecked with, None for on disk
+        self.typechecked_files = {}
+        # Modified buffers awaiting a background typecheck, path -> number
+        self.dirty_buffers = {}
+        self.typecheck_due = None
+        self.typecheck_in_flight = None  # When the background run was sent
+        self._typecheck_timer = None
         super(TypecheckHandler, self).__init__()
 
+    def mark_typechecked(self, path, digest=None):
+        """Notes of a file will be cached, for given contents or those on disk."""
+        path = os.path.abspath(path)
+        if digest or path not in self.typechecked_files:
+            self.typechecked_files[path] = digest
+
     def buffer_typechecks(self, call_id, payload):
         """Adds typecheck events to the buffer"""
+        self.project_notes.add(payload['notes'])
+        for note in payload['notes']:
+            self.mark_typechecked(note['file'])
         if self.currently_buffering_typechecks:
             for note in payload['notes']:
                 self.buffered_notes.append(note)
+            if self.typecheck_budget:
+                self.unrendered_notes.extend(payload['notes'])
+                self.render_typecheck_progress()
+
+    def render_typecheck_progress(self):
+        """Highlights notes received so far, as many as the budget allows.
+
+        Notes in view go first; the rest wait for the next batch of notes, or
+        for the full rendering once the typecheck is complete.
+        """
+        self.unrendered_notes = self.editor.highlight_notes(
+            self.unrendered_notes, self.typecheck_budget)
 
     def start_typechecking(self):
         self.log.info('Readying typecheck...')
         self.currently_buffering_typechecks = True
         if self.currently_buffering_typechecks:
             self.buffered_notes = []
+            self.unrendered_notes = []
+
+    def clear_notes(self, call_id, payload):
+        """Handles ``ClearAllScalaNotesEvent``, sent before a full typecheck."""
+        for note in self.project_notes:
+            self.mark_typechecked(note['file'])
+        self.project_notes.clear()
+
+    def show_buffer_notes(self):
+        """Displays the known notes of the file entering the current buffer.
+
+        Until the server reports on the file, notes cached by an earlier
+        session are shown if the file is unchanged since.
+        """
+        # The full name, autocmd filenames are relative to Vim's cwd, not ours
+        path = self.editor.path()
+        notes = self.project_notes.for_file(path)
+        if not notes and path in self.notes_cache:
+            notes = self.notes_cache.get(path, self.editor.snapshot().digest)
+        if notes:
+            self.editor.display_notes(notes)
+
+    def cache_notes(self):
+        """Persists the notes of files typechecked since the last call."""
+        if not self.typechecked_files:
+            return
+        for path, digest in self.typechecked_files.items():
+            notes = self.project_notes.for_file(path)
+            digest = digest or self.disk_digests.get(path)
+            self.notes_cache.update(path, digest, notes)
+        self.typechecked_files = {}
+        if not self.notes_cache.save():
+            self.log.warning('Could not write %s', self.notes_cache.filepath)
+
+    def show_diagnostics(self):
+        """Fills the quickfix list with the notes of the whole project."""
+        qflist = []
+        for note in self.project_notes:
+            item = self.editor.to_quickfix_item(str(note['file']),
+                                                note['line'],
+                                                note['msg'],
+                                                note['severity']['typehint'][4:5])
+            item['col'] = note['col']
+            qflist.append(item)
+
+        if qflist:
+            self.editor.write_quickfix_list(qflist)
+        else:
+            self.editor.message('no_diagnostics')
+
+    def on_text_changed(self, filename):
+        """Schedules a background typecheck of the current buffer, once edits
+        have settled for :attr:`typecheck_debounce` seconds.
+
+        Edits to several buffers in the meantime are typechecked together.
+        """
+        if not self.typecheck_debounce:
+            return
+        self.dirty_buffers[self.editor.path()] = self.editor.bufnr()
+        self.typecheck_due = time.time() + self.typecheck_debounce
+        if self.schedule and not self._typecheck_timer:
+            self._arm_typecheck_timer(self.typecheck_debounce)
+
+    def _arm_typecheck_timer(self, delay):
+        """Wake up the main thread in ``delay`` seconds to typecheck if due.
+
+        Only with push delivery, otherwise the polling on cursor events
+        checks instead.
+        """
+        self._typecheck_timer = Timer(delay, self.schedule,
+                                      [self._typecheck_timer_fired])
+        self._typecheck_timer.daemon = True
+        self._typecheck_timer.start()
+
+    def _typecheck_timer_fired(self):
+        self._typecheck_timer = None
+        self.typecheck_if_due()
+
+    def typecheck_if_due(self):
+        """Sends the background typecheck of modified buffers if it's time.
+
+        A run still in progress holds back the next one until it completes,
+        so that the server never works on superseded contents in parallel.
+        """
+        if not self.dirty_buffers:
+            return
+        now = time.time()
+        if now < self.typecheck_due:
+            if self.schedule and not self._typecheck_timer:
+                self._arm_typecheck_timer(self.typecheck_due - now)
+            return
+        in_flight = self.typecheck_in_flight
+        if in_flight is not None and now - in_flight < self.typecheck_timeout:
+            return
+        self.typecheck_buffers()
+
+    def typecheck_buffers(self):
+        """Typechecks the contents of all modified buffers in one request."""
+        files = []
+        for path, bufnr in self.dirty_buffers.items():
+            try:
+                snapshot = BufferSnapshot(self.editor.getlines(bufnr), None)
+            except KeyError:  # Buffer was wiped out
+                continue
+            files.append({"file": path, "contents": snapshot.text})
+            # The server reports the file's notes anew
+            self.project_notes.clear(path)
+            self.mark_typechecked(path, snapshot.digest)
+        self.dirty_buffers = {}
+
+        if files:
+            self.log.debug('typecheck_buffers: %s', [f["file"] for f in files])
+            self.typecheck_in_flight = time.time()
+            self.send_request({"typehint": "TypecheckFilesReq", "files": files})
 
     def handle_typecheck_complete(self, call_id, payload):
         """Handles ``NewScalaNotesEvent```.
 
         Calls editor to display/highlight line notes and clears notes buffer.
         """
+        self.cache_notes()
+        if self.typecheck_in_flight is not None:
+            self.typecheck_in_flight = None
+            if not self.currently_buffering_typechecks:
+                self.editor.display_notes(
+                    self.project_notes.for_file(self.editor.path()))
+            # Edits made while it was running
+            self.typecheck_if_due()
         if not self.currently_buffering_typechecks:
             return
 
         self.editor.display_notes(self.buffered_notes)
         self.currently_buffering_typechecks = False
         self.buffered_notes = []
+        self.unrendered_notes = []
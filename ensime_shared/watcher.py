@@ -0,0 +1,213 @@
+# coding: utf-8
+
+"""
+Notice when a launched server is ready to accept connections, without
+probing it on every editor event.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from threading import Thread
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def _bytes(path):
+    """A path as bytes for C, leaving Python 2 ``str`` paths as they are."""
+    if isinstance(path, bytes):
+        return path
+    return path.encode(sys.getfilesystemencoding() or 'utf-8')
+
+
+def _libc():
+    """The C library if it provides inotify, otherwise ``None``."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, 'inotify_init1') else None  # Linux only
+
+
+class InotifyChanges(object):
+    """Wait for changes to files of a directory with Linux's inotify.
+
+    Args:
+        libc: The C library, as returned by :func:`_libc`.
+        dirpath (str): Directory to watch.
+        names (Iterable[str]): Names of the files to wait for in it.
+
+    Raises:
+        OSError: If the watch can't be set up.
+    """
+
+    def __init__(self, libc, dirpath, names):
+        self._names = set(_bytes(name) for name in names)
+        self._fd = libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        try:
+            if libc.inotify_add_watch(self._fd, _bytes(dirpath), mask) < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def wait(self, timeout):
+        """Block until a file changes, or for ``timeout`` seconds.
+
+        Returns:
+            bool: Whether one of the files changed.
+        """
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            if readable and self._names.intersection(self._read_names()):
+                return True
+
+    def close(self):
+        os.close(self._fd)
+
+    def _read_names(self):
+        data = os.read(self._fd, 4096)
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, _, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            yield data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+
+class PollingChanges(object):
+    """Wait for changes to files by checking their size and modification time.
+
+    The fallback where inotify isn't available.
+
+    Args:
+        dirpath (str): Directory of the files.
+        names (Iterable[str]): Names of the files to wait for in it.
+    """
+
+    interval = 0.2  # seconds
+
+    def __init__(self, dirpath, names):
+        self._paths = [os.path.join(dirpath, name) for name in names]
+        self._stats = self._stat()
+
+    def wait(self, timeout):
+        """Block until a file changes, or for ``timeout`` seconds.
+
+        Returns:
+            bool: Whether one of the files changed.
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            time.sleep(self.interval)
+            stats = self._stat()
+            if stats != self._stats:
+                self._stats = stats
+                return True
+        return False
+
+    def close(self):
+        pass
+
+    def _stat(self):
+        stats = []
+        for path in self._paths:
+            try:
+                st = os.stat(path)
+                stats.append((st.st_size, st.st_mtime))
+            except OSError:
+                stats.append(None)
+        return stats
+
+
+class ReadinessWatcher(object):
+    """Calls back once, from a background thread, when a server is ready.
+
+    The server writes its HTTP port to the ``http`` file of its cache dir
+    once it's listening, and logs to ``server.log`` as it starts. Changes to
+    those files wake the watcher up to probe the server, as does a quiet
+    second, so it's probed only while it's starting up and as soon as it
+    may be ready. Changes are watched with inotify where available,
+    otherwise by polling the files.
+
+    Args:
+        cache_dir (str): The server's cache directory.
+        probe (Callable[[], bool]): Whether the server is ready. Only called
+            once the port file exists.
+        on_ready (Callable[[], None]): Called when it is.
+        alive (Callable[[], bool]): Whether the server is still running, the
+            watcher gives up if not.
+    """
+
+    idle_timeout = 1.0  # seconds
+    probe_interval = 0.2  # seconds, at least between two probes
+
+    def __init__(self, cache_dir, probe, on_ready, alive=lambda: True):
+        self.cache_dir = cache_dir
+        self.probe = probe
+        self.on_ready = on_ready
+        self.alive = alive
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._thread = Thread(name='ensime-readiness', target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching, the callback won't be called anymore."""
+        self._stopped = True
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def is_alive(self):
+        """bool: Whether the background thread is still running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _changes(self):
+        names = ['http', 'server.log']
+        libc = _libc()
+        if libc:
+            try:
+                return InotifyChanges(libc, self.cache_dir, names)
+            except Exception:  # Not worth missing the server for
+                pass
+        return PollingChanges(self.cache_dir, names)
+
+    def _ready(self):
+        port_file = os.path.join(self.cache_dir, 'http')
+        return os.path.exists(port_file) and self.probe()
+
+    def _run(self):
+        # Watch before the first look, so no change is missed in between
+        changes = self._changes()
+        try:
+            while not self._stopped and self.alive():
+                if self._ready():
+                    if not self._stopped:
+                        self.on_ready()
+                    return
+                time.sleep(self.probe_interval)
+                changes.wait(self.idle_timeout)
+        finally:
+            changes.close()
@@ -14,21 +14,37 @@ else
     endif
 
     " Defer to the rplugin for Neovim
-    if has('nvim') | finish | endif
+    if has('nvim')
+        " Only bother the plugin on every keystroke if it needs to know
+        if get(g:, 'ensime_typecheck_as_you_type', 0)
+            augroup ensime_as_you_type
+                autocmd!
+                autocmd TextChanged,TextChangedI *.scala call EnTextChanged(expand("<afile>"))
+            augroup END
+        endif
+        finish
+    endif
 endif
 
 augroup ensime
     autocmd!
     autocmd VimLeave *.scala call ensime#au_vim_leave(expand("<afile>"))
     autocmd VimEnter *.scala call ensime#au_vim_enter(expand("<afile>"))
+    autocmd BufEnter *.scala call ensime#au_buf_enter(expand("<afile>"))
     autocmd BufLeave *.scala call ensime#au_buf_leave(expand("<afile>"))
     autocmd CursorHold *.scala call ensime#au_cursor_hold(expand("<afile>"))
     autocmd CursorMoved *.scala call ensime#au_cursor_moved(expand("<afile>"))
+    if get(g:, 'ensime_typecheck_as_you_type', 0)
+        autocmd TextChanged,TextChangedI *.scala call ensime#au_text_changed(expand("<afile>"))
+    endif
 augroup END
 
 command! -nargs=* -range EnInstall call ensime#com_en_install([<f-args>], '')
 command! -nargs=* -range EnNoTeardown call ensime#com_en_no_teardown([<f-args>], '')
 command! -nargs=* -range EnTypeCheck call ensime#com_en_type_check([<f-args>], '')
+command! -nargs=* -range EnDiagnostics call ensime#com_en_diagnostics([<f-args>], '')
+command! -nargs=* -range EnServerStats call ensime#com_en_server_stats([<f-args>], '')
+command! -nargs=* -range EnStartupProfile call ensime#com_en_startup_profile([<f-args>], '')
 command! -nargs=* -range EnType call ensime#com_en_type([<f-args>], '')
 command! -nargs=* -range EnSearch call ensime#com_en_sym_search([<f-args>], '')
 command! -nargs=* -range EnFormatSource call ensime#com_en_format_source([<f-args>], '')
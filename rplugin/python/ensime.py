@@ -18,6 +18,7 @@ def ensime_init_path():
 
 ensime_init_path()
 
+from ensime_shared.buffers import BufferMirrors  # noqa: E402
 from ensime_shared.ensime import Ensime  # noqa: E402
 
 # Params for autocmd by default
@@ -41,6 +42,27 @@ class NeovimEnsime(Ensime):
 
     def __init__(self, vim):
         super(NeovimEnsime, self).__init__(vim)
+        # Contents of Scala buffers, synced by nvim_buf_attach events
+        self.mirrors = BufferMirrors()
+
+    def create_client(self, config_path):
+        client = super(NeovimEnsime, self).create_client(config_path)
+        # Handle server messages on the event loop as soon as they arrive
+        client.enable_push(self._vim.async_call)
+        client.editor.mirrors = self.mirrors
+        return client
+
+    @neovim.rpc_export('nvim_buf_lines_event')
+    def on_buf_lines_event(self, buf, changedtick, firstline, lastline, linedata, more):
+        self.mirrors.on_lines(buf.number, firstline, lastline, linedata)
+
+    @neovim.rpc_export('nvim_buf_changedtick_event')
+    def on_buf_changedtick_event(self, buf, changedtick):
+        pass  # Contents are unchanged
+
+    @neovim.rpc_export('nvim_buf_detach_event')
+    def on_buf_detach_event(self, buf):
+        self.mirrors.on_detach(buf.number)
 
     @neovim.command('EnToggleTeardown', **command_params)
     def com_en_toggle_teardown(self, *args, **kwargs):
@@ -50,6 +72,18 @@ class NeovimEnsime(Ensime):
     def com_en_type_check(self, *args, **kwargs):
         super(NeovimEnsime, self).com_en_type_check(*args, **kwargs)
 
+    @neovim.command('EnDiagnostics', **command_params)
+    def com_en_diagnostics(self, *args, **kwargs):
+        super(NeovimEnsime, self).com_en_diagnostics(*args, **kwargs)
+
+    @neovim.command('EnServerStats', **command_params)
+    def com_en_server_stats(self, *args, **kwargs):
+        super(NeovimEnsime, self).com_en_server_stats(*args, **kwargs)
+
+    @neovim.command('EnStartupProfile', **command_params)
+    def com_en_startup_profile(self, *args, **kwargs):
+        super(NeovimEnsime, self).com_en_startup_profile(*args, **kwargs)
+
     @neovim.command('EnType', **command_params)
     def com_en_type(self, *args, **kwargs):
         super(NeovimEnsime, self).com_en_type(*args, **kwargs)
@@ -170,6 +204,10 @@ class NeovimEnsime(Ensime):
     def au_vim_leave(self, *args, **kwargs):
         super(NeovimEnsime, self).au_vim_leave(*args, **kwargs)
 
+    @neovim.autocmd('BufEnter', **autocmd_params)
+    def au_buf_enter(self, *args, **kwargs):
+        super(NeovimEnsime, self).au_buf_enter(*args, **kwargs)
+
     @neovim.autocmd('BufLeave', **autocmd_params)
     def au_buf_leave(self, *args, **kwargs):
         super(NeovimEnsime, self).au_buf_leave(*args, **kwargs)
@@ -182,6 +220,12 @@ class NeovimEnsime(Ensime):
     def au_cursor_moved(self, *args, **kwargs):
         super(NeovimEnsime, self).au_cursor_moved(*args, **kwargs)
 
+    # Called by TextChanged autocmds, which plugin/ensime.vim only defines
+    # when typechecking as you type. Don't block typing on it.
+    @neovim.function('EnTextChanged', sync=False)
+    def fun_en_text_changed(self, args):
+        super(NeovimEnsime, self).au_text_changed(*args)
+
     @neovim.function('EnCompleteFunc', sync=True)
     def fun_en_complete_func(self, *args, **kwargs):
         return super(NeovimEnsime, self).fun_en_complete_func(*args, **kwargs)
@@ -0,0 +1,41 @@
+# coding: utf-8
+
+"""
+Timings of local completion ranking, left out of the unit tests since they
+depend on the machine. Run with ``make benchmark``.
+"""
+
+import itertools
+import time
+
+from ensime_shared.completion import CompletionSession
+
+WORDS = ['fold', 'map', 'flat', 'filter', 'to', 'get', 'left', 'right', 'option',
+         'string', 'index', 'for', 'each', 'zip', 'with', 'size', 'head', 'last']
+
+
+def session_with(count):
+    names = [a + b.capitalize() + c.capitalize()
+             for a, b, c in itertools.product(WORDS, repeat=3)][:count]
+    session = CompletionSession('A.scala', 3, 'xs.', '', count + 1)
+    session.update([{"name": name, "typeInfo": {}} for name in names])
+    return session
+
+
+def best_of(runs, setup, timed):
+    timings = []
+    for _ in range(runs):
+        setup()
+        start = time.time()
+        timed()
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def test_refining_2000_candidates():
+    session = session_with(2000)
+    print('')
+    for shorter, longer in [('f', 'fo'), ('fo', 'fol'), ('fol', 'fold'), ('fold', 'foldL')]:
+        best = best_of(20, lambda: session.rank(shorter, limit=100),
+                       lambda: session.rank(longer, limit=100))
+        print('{:>6} -> {:<6} {:.3f} ms'.format(shorter, longer, best * 1000))
@@ -0,0 +1,119 @@
+# coding: utf-8
+
+import pytest
+from mock import Mock
+
+from ensime_shared.buffers import (BufferMirror, BufferMirrors, BufferSnapshot,
+                                   DiskDigests, LineIndex)
+
+
+class FakeBuffer(object):
+    """A list of lines that records which slices were fetched."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.fetches = []
+
+    def fetch(self, start, end):
+        self.fetches.append((start, end))
+        return self.lines[start:end]
+
+
+class TestLineIndex:
+    lines = ['package foo', '', 'object Bar {', '  val x = 1', '}']
+
+    @pytest.fixture
+    def buf(self):
+        return FakeBuffer(self.lines[:])
+
+    @pytest.fixture
+    def index(self, buf):
+        return LineIndex(buf.fetch, 1)
+
+    def test_offsets_match_summed_line_lengths(self, index):
+        for row in range(1, len(self.lines) + 1):
+            expected = sum(len(line) + 1 for line in self.lines[:row - 1]) + 3
+            assert index.offset(row, 3) == expected
+
+    def test_fetches_lines_lazily_and_once(self, index, buf):
+        index.offset(1, 0)
+        assert buf.fetches == []
+
+        index.offset(3, 0)
+        index.offset(2, 0)
+        index.offset(4, 0)
+        assert buf.fetches == [(0, 2), (2, 3)]
+
+    def test_positions_invert_offsets(self, index):
+        for row, line in enumerate(self.lines, start=1):
+            for col in range(len(line) + 1):
+                assert index.position(index.offset(row, col)) == (row, col)
+
+    def test_position_past_the_end(self, index):
+        end = sum(len(line) + 1 for line in self.lines)
+        assert index.position(end) == (5, 2)
+
+
+class TestBufferSnapshot:
+    def test_joins_lines_lazily(self):
+        snapshot = BufferSnapshot(['object A', '}'], 1)
+        assert snapshot._text is None
+        assert snapshot.text == 'object A\n}'
+        assert snapshot.encoded == b'object A\n}'
+
+    def test_digest_matches_written_file(self, tmpdir):
+        lines = ['object A {', u'  val \xe9 = 1', '}']
+        f = tmpdir.join('A.scala')
+        f.write_binary(u'\n'.join(lines).encode('utf-8') + b'\n')
+
+        digests = DiskDigests()
+        assert BufferSnapshot(lines, 1).digest == digests.get(f.strpath)
+        assert BufferSnapshot(lines + [''], 2).digest != digests.get(f.strpath)
+
+    def test_digest_of_missing_file(self, tmpdir):
+        assert DiskDigests().get(tmpdir.join('nope.scala').strpath) is None
+
+
+class TestBufferMirror:
+    def test_applies_line_events(self):
+        mirror = BufferMirror()
+        assert not mirror.ready
+
+        mirror.update(0, -1, ['a', 'b', 'c'])
+        mirror.update(1, 2, ['B1', 'B2'])  # Change a line into two
+        mirror.update(3, 3, ['d'])  # Insert
+        mirror.update(0, 1, [])  # Delete
+
+        assert mirror.ready
+        assert mirror.lines == ['B1', 'B2', 'd', 'c']
+
+    def test_snapshots_are_immutable(self):
+        mirror = BufferMirror()
+        mirror.update(0, -1, ['a', 'b'])
+        snapshot = mirror.snapshot()
+        assert mirror.snapshot() is snapshot
+
+        mirror.update(0, 1, ['x'])
+        assert snapshot.text == 'a\nb'
+        assert mirror.snapshot().text == 'x\nb'
+        assert mirror.line_index().offset(2, 0) == 2
+
+
+class TestBufferMirrors:
+    def test_mirrors_attached_buffers(self):
+        buf = Mock(number=3)
+        buf.api.attach.return_value = True
+        mirrors = BufferMirrors()
+
+        mirrors.attach(buf)
+        mirrors.attach(buf)
+        buf.api.attach.assert_called_once_with(True, {})
+        assert mirrors.get(3) is None  # Contents not received yet
+
+        mirrors.on_lines(3, 0, -1, ['a'])
+        mirrors.on_lines(4, 0, -1, ['not attached'])
+        assert mirrors.get(3).lines == ['a']
+        assert mirrors.get(4) is None
+
+        mirrors.on_detach(3)
+        assert mirrors.get(3) is None
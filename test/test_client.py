@@ -0,0 +1,144 @@
+# coding: utf-8
+
+import json
+import socket
+import time
+
+import pytest
+from mock import Mock
+
+from ensime_shared.client import EnsimeClientV2
+from ensime_shared.receiver import WebsocketReceiver
+
+
+class FakeWebsocket(object):
+    """Just enough of ``websocket.WebSocket`` over a plain socket."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.sent = []
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def recv(self):
+        data = self.sock.recv(4096)
+        if not data:
+            raise IOError('connection closed')
+        return data.decode('utf-8')
+
+    def send(self, msg):
+        self.sent.append(msg)
+
+    def close(self):
+        self.sock.close()
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.001)
+    return predicate()
+
+
+@pytest.fixture
+def launcher(tmpdir):
+    launcher = Mock()
+    launcher.config = {
+        'name': 'project',
+        'root-dir': str(tmpdir),
+        'cache-dir': str(tmpdir.join('.ensime_cache')),
+    }
+    return launcher
+
+
+@pytest.fixture
+def make_client(launcher):
+    """Build clients connected to a fake server, returning its end too."""
+    def make_client(receiver=None):
+        vim = Mock()
+        vim.eval.return_value = ''
+        client = EnsimeClientV2(Mock(), vim, launcher, receiver=receiver)
+        client.dispatch = Mock()
+        # Messages keep their boundaries, like websocket frames
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        client.ws = FakeWebsocket(ours)
+        client.receiver.register(client.ws, client.on_message, client.on_receive_error)
+        clients.append((client, theirs))
+        return client, theirs
+
+    clients = []
+    yield make_client
+    for client, theirs in clients:
+        client.teardown()
+        theirs.close()
+
+
+@pytest.fixture
+def receiver():
+    r = WebsocketReceiver()
+    yield r
+    r.shutdown()
+
+
+def reply(server, call_id, typehint):
+    msg = {"callId": call_id, "payload": {"typehint": typehint}}
+    server.send(json.dumps(msg).encode('utf-8'))
+
+
+class TestPushDelivery:
+    def test_schedules_dispatch_as_messages_arrive(self, make_client):
+        client, server = make_client()
+        scheduled = []
+        client.enable_push(scheduled.append)
+
+        reply(server, 0, "TypeInspectInfo")
+        assert wait_for(lambda: scheduled)
+        assert not client.dispatch.called
+
+        scheduled.pop()()
+        client.dispatch.assert_called_once_with(
+            {"callId": 0, "payload": {"typehint": "TypeInspectInfo"}})
+
+    def test_drops_superseded_responses(self, make_client):
+        client, server = make_client()
+        scheduled = []
+        client.enable_push(scheduled.append)
+        client.send_request({"typehint": "TypeAtPointReq"})
+        client.send_request({"typehint": "TypeAtPointReq"})
+
+        reply(server, 0, "TypeInfo")
+        reply(server, 1, "TypeInfo")
+        assert wait_for(lambda: scheduled)
+
+        scheduled.pop()()
+        assert scheduled == []
+        client.dispatch.assert_called_once_with(
+            {"callId": 1, "payload": {"typehint": "TypeInfo"}})
+
+
+class TestSharedReceiver:
+    def test_routes_messages_to_their_client(self, make_client, receiver):
+        (a, server_a), (b, server_b) = make_client(receiver), make_client(receiver)
+
+        reply(server_b, 0, "TypeInfo")
+        reply(server_a, 0, "SymbolInfo")
+        assert wait_for(lambda: a.queue.qsize() and b.queue.qsize())
+        assert a.queue.get()["payload"]["typehint"] == "SymbolInfo"
+        assert b.queue.get()["payload"]["typehint"] == "TypeInfo"
+
+    def test_teardown_leaves_other_clients_receiving(self, make_client, receiver):
+        (a, _), (b, server_b) = make_client(receiver), make_client(receiver)
+        ws, fd = a.ws, a.ws.fileno()
+
+        a.teardown()
+        assert receiver.running
+        assert not receiver._is_watched(fd, ws)
+
+        reply(server_b, 0, "TypeInfo")
+        assert wait_for(lambda: b.queue.qsize())
+
+    def test_client_shuts_its_own_receiver_down(self, make_client):
+        client, _ = make_client()
+        client.teardown()
+        assert not client.receiver.running
@@ -0,0 +1,111 @@
+# coding: utf-8
+
+import heapq
+
+from ensime_shared import completion as completion_module
+from ensime_shared.completion import CandidateKey, CompletionSession, fuzzy_score, rank
+
+
+def completion(name):
+    return {"name": name, "typeInfo": {}}
+
+
+def session_with(names, max_results=100):
+    session = CompletionSession('A.scala', 3, 'xs.', 'fo', max_results)
+    session.update([completion(n) for n in names])
+    return session
+
+
+class TestCompletionSession:
+    def test_covers_longer_prefixes_at_same_position(self):
+        session = session_with(['foo', 'fold'])
+        assert session.covers('A.scala', 3, 'xs.', 'fo')
+        assert session.covers('A.scala', 3, 'xs.', 'fol')
+
+    def test_does_not_cover_other_contexts(self):
+        session = session_with(['foo', 'fold'])
+        assert not session.covers('A.scala', 3, 'xs.', 'f')
+        assert not session.covers('A.scala', 3, 'xs. ', 'fol')
+        assert not session.covers('A.scala', 4, 'xs.', 'fol')
+        assert not session.covers('B.scala', 3, 'xs.', 'fol')
+
+    def test_does_not_cover_another_receiver(self):
+        session = session_with(['foo', 'fold'])
+        assert not session.covers('A.scala', 3, 'ys.', 'fol')
+
+    def test_does_not_cover_truncated_or_missing_results(self):
+        assert not session_with(['foo', 'fold'], max_results=2).covers('A.scala', 3, 'xs.', 'fol')
+        pending = CompletionSession('A.scala', 3, 'xs.', 'fo', 100)
+        assert not pending.covers('A.scala', 3, 'xs.', 'fol')
+
+    def test_ranks_completions(self):
+        session = session_with(['fold', 'foo', 'forall', 'fox'])
+        names = [c["name"] for c in session.rank('fo')]
+        assert names == ['foo', 'fox', 'fold', 'forall']
+        names = [c["name"] for c in session.rank('fol', limit=1)]
+        assert names == ['fold']
+
+    def test_filters_out_completions_without_type_info(self):
+        session = CompletionSession('A.scala', 3, 'xs.', 'fo', 100)
+        session.update([completion('foo'), {"name": "fob"}])
+        assert [c["name"] for c in session.rank('fo')] == ['foo']
+
+    def test_truncation_counts_filtered_out_completions(self):
+        session = CompletionSession('A.scala', 3, 'xs.', 'fo', 2)
+        session.update([completion('foo'), {"name": "fob"}])
+        assert not session.complete
+
+
+def score(pattern, name):
+    return fuzzy_score(pattern, CandidateKey(name))
+
+
+class TestFuzzyScore:
+    def test_humps(self):
+        assert CandidateKey('foldLeft').humps == 'fl'
+        assert CandidateKey('to_string').humps == 'ts'
+        assert CandidateKey('URLDecoder').humps == 'u'
+
+    def test_rejects_non_subsequences(self):
+        assert score('fx', 'foldLeft') is None
+        assert score('tf', 'foldLeft') is None
+
+    def test_match_kinds_rank_in_tiers(self):
+        scores = [
+            score('fold', 'foldLeft'),  # exact prefix
+            score('FOLD', 'foldLeft'),  # prefix ignoring case
+            score('fL', 'foldLeft'),  # humps
+            score('fdt', 'foldLeft'),  # subsequence
+        ]
+        assert scores == sorted(scores, reverse=True)
+        assert len(set(scores)) == len(scores)
+
+    def test_rewards_word_starts_and_runs(self):
+        assert score('fle', 'foldLeft') > score('fle', 'filter')
+
+
+def test_rank_orders_by_score_then_length_then_position():
+    keys = [CandidateKey(n) for n in ['flatMap', 'foldLeft', 'fl', 'foldRight', 'map']]
+    assert rank('fl', keys) == [2, 0, 1, 3]
+    assert rank('fl', keys, limit=2) == [2, 0]
+
+
+def test_session_ranking_narrows_without_losing_matches():
+    names = ['foldLeft', 'flatMap', 'filter', 'find', 'foreach', 'fL']
+    session = session_with(names, max_results=100)
+    keys = [CandidateKey(n) for n in names]
+    for prefix in ['f', 'fl', 'fle', 'Fle']:
+        expected = [names[i] for i in rank(prefix, keys)]
+        assert [c["name"] for c in session.rank(prefix)] == expected
+
+
+def test_refining_scores_only_previous_matches(mocker):
+    names = ['fold' + str(i) for i in range(500)] + ['map' + str(i) for i in range(1500)]
+    session = session_with(names, max_results=len(names) + 1)
+    session.rank('fo', limit=100)
+
+    score = mocker.patch('ensime_shared.completion._score', side_effect=completion_module._score)
+    nsmallest = mocker.spy(heapq, 'nsmallest')
+    assert len(session.rank('fol', limit=100)) == 100
+    assert score.call_count == 500
+    assert nsmallest.call_count == 1
@@ -0,0 +1,102 @@
+# coding: utf-8
+
+import pytest
+
+from ensime_shared.diagnostics import Diagnostics, NotesCache, ProjectNotes
+from ensime_shared.errors import Error
+
+
+@pytest.fixture
+def diagnostics():
+    store = Diagnostics()
+    store.add(Error('/src/A.scala', 'outer', 3, 2, 20))
+    store.add(Error('/src/A.scala', 'inner', 3, 8, 12))
+    store.add(Error('/src/A.scala', 'other line', 5, 0, 4))
+    store.add(Error('/src/B.scala', 'other file', 3, 2, 20))
+    return store
+
+
+def test_finds_error_covering_column(diagnostics):
+    assert diagnostics.at('/src/A.scala', 3, 2).message == 'outer'
+    assert diagnostics.at('/src/A.scala', 3, 19).message == 'outer'
+    assert diagnostics.at('/src/A.scala', 5, 3).message == 'other line'
+    assert diagnostics.at('/src/B.scala', 3, 10).message == 'other file'
+
+
+def test_prefers_innermost_error(diagnostics):
+    assert diagnostics.at('/src/A.scala', 3, 9).message == 'inner'
+    assert diagnostics.at('/src/A.scala', 3, 12).message == 'outer'
+
+
+def test_misses_outside_errors(diagnostics):
+    assert diagnostics.at('/src/A.scala', 3, 1) is None
+    assert diagnostics.at('/src/A.scala', 3, 20) is None
+    assert diagnostics.at('/src/A.scala', 4, 5) is None
+    assert diagnostics.at('/src/C.scala', 3, 5) is None
+
+
+def test_clears_per_file(diagnostics):
+    assert len(diagnostics) == 4
+    diagnostics.clear('/src/A.scala')
+
+    assert len(diagnostics) == 1
+    assert diagnostics.at('/src/A.scala', 3, 5) is None
+    assert [e.message for e in diagnostics] == ['other file']
+
+    diagnostics.clear()
+    assert not diagnostics
+
+
+class TestProjectNotes:
+    @staticmethod
+    def note(path, line, col=1):
+        return {'file': path, 'line': line, 'col': col, 'msg': 'error'}
+
+    def test_keeps_notes_by_file_and_position(self):
+        notes = ProjectNotes()
+        notes.add([self.note('/src/B.scala', 9), self.note('/src/A.scala', 4)])
+        notes.add([self.note('/src/A.scala', 2)])
+
+        assert [n['line'] for n in notes.for_file('/src/A.scala')] == [2, 4]
+        assert notes.for_file('/src/C.scala') == []
+        assert [(n['file'], n['line']) for n in notes] == [
+            ('/src/A.scala', 2), ('/src/A.scala', 4), ('/src/B.scala', 9)]
+
+    def test_clears_per_file(self):
+        notes = ProjectNotes()
+        notes.add([self.note('/src/A.scala', 4), self.note('/src/B.scala', 9)])
+
+        notes.clear('/src/A.scala')
+        assert len(notes) == 1
+        notes.clear()
+        assert len(notes) == 0
+
+
+class TestNotesCache:
+    notes = [{'file': '/src/A.scala', 'line': 4, 'col': 1, 'msg': 'error'}]
+
+    def test_persists_notes_for_matching_contents(self, tmpdir):
+        filepath = str(tmpdir.join('notes.json'))
+        cache = NotesCache(filepath)
+        cache.update('/src/A.scala', 'abc', self.notes)
+        assert cache.save()
+
+        cache = NotesCache(filepath)
+        assert '/src/A.scala' in cache
+        assert cache.get('/src/A.scala', 'abc') == self.notes
+        assert cache.get('/src/A.scala', 'def') is None
+        assert cache.get('/src/B.scala', 'abc') is None
+
+    def test_forgets_files_without_notes(self, tmpdir):
+        cache = NotesCache(str(tmpdir.join('notes.json')))
+        cache.update('/src/A.scala', 'abc', self.notes)
+        cache.update('/src/A.scala', 'def', [])
+
+        assert '/src/A.scala' not in cache
+
+    def test_starts_empty_without_readable_file(self, tmpdir):
+        broken = tmpdir.join('notes.json')
+        broken.write('{')
+
+        assert NotesCache(str(broken)).entries == {}
+        assert NotesCache(str(tmpdir.join('missing.json'))).entries == {}
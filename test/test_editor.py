@@ -1,9 +1,10 @@
 # coding: utf-8
 
 import pytest
-from mock import call, sentinel
+from mock import call, MagicMock, sentinel
 
-from ensime_shared.editor import Editor
+from ensime_shared.buffers import BufferMirrors
+from ensime_shared.editor import Editor, symbol_bounds
 
 
 @pytest.fixture
@@ -121,6 +122,73 @@ class TestSplitWindow:
         editor.set_buffer_options.assert_called_once_with(sentinel.bufopts)
 
 
+def test_ask_input(editor, vim):
+    vim.eval.side_effect = None
+    vim.eval.return_value = 'Foo'
+
+    assert editor.ask_input("Rename to:") == 'Foo'
+    vim.eval.assert_called_once_with(
+        "[inputsave(), input('Rename to: '), inputrestore()][1]")
+
+
+class TestBatch:
+    def test_runs_commands_at_once_with_execute(self, editor, vim):
+        vim.eval.side_effect = None
+        vim.eval.return_value = 1  # Vim has execute()
+
+        with editor.batch():
+            editor.command('copen')
+            with editor.batch():
+                editor.command("echo 'hi'")
+            assert not vim.command.called
+
+        vim.command.assert_called_once_with(
+            "call execute(['copen', 'echo ''hi'''])")
+
+    def test_runs_commands_one_by_one_without_execute(self, editor, vim):
+        vim.eval.side_effect = None
+        vim.eval.return_value = 0
+
+        with editor.batch():
+            editor.command('copen')
+            editor.command('redraw')
+
+        assert vim.command.call_args_list == [call('copen'), call('redraw')]
+
+    def test_runs_commands_atomically_on_neovim(self, editor, vim):
+        editor._isneovim = True
+        vim.api.call_atomic.return_value = [[None, None], None]
+
+        with editor.batch():
+            editor.command('copen')
+            editor.command('redraw')
+
+        vim.api.call_atomic.assert_called_once_with([
+            ['nvim_command', ['copen']],
+            ['nvim_command', ['redraw']],
+        ])
+        assert not vim.command.called
+
+    def test_reports_neovim_errors(self, editor, vim):
+        editor._isneovim = True
+        vim.api.call_atomic.return_value = [[None], [1, 0, 'Not an editor command']]
+
+        with pytest.raises(RuntimeError):
+            with editor.batch():
+                editor.command('copen')
+                editor.command('bogus')
+
+    def test_drops_commands_if_block_raises(self, editor, vim):
+        with pytest.raises(ValueError):
+            with editor.batch():
+                editor.command('copen')
+                raise ValueError()
+
+        assert not vim.mock_calls
+        editor.command('redraw')
+        vim.command.assert_called_once_with('redraw')
+
+
 def test_write(editor, vim):
     editor.write()
     editor.write(noautocmd=True)
@@ -129,3 +197,208 @@ def test_write(editor, vim):
         call.command('write'),
         call.command('noautocmd write'),
     ]
+
+
+class TestLineIndex:
+    def test_is_cached_until_buffer_changes(self, editor, vim):
+        vim.eval.side_effect = None
+        vim.eval.return_value = '1'
+        vim.current.buffer.number = 1
+
+        index = editor.line_index()
+        assert editor.line_index() is index
+        vim.eval.assert_called_with('b:changedtick')
+
+        vim.eval.return_value = '2'
+        assert editor.line_index() is not index
+
+    def test_reuses_lines_of_snapshot(self, editor, vim):
+        vim.eval.side_effect = None
+        vim.eval.return_value = '1'
+        buf = vim.current.buffer = MagicMock(number=1)
+        buf.__getitem__.return_value = ['object A {', '}']
+
+        assert editor.snapshot().text == 'object A {\n}'
+        assert editor.line_index().offset(2, 0) == 11
+        assert buf.__getitem__.call_count == 1
+
+
+class TestDisplayNotes:
+    @staticmethod
+    def note(line, col, msg='error'):
+        return {'file': '/src/A.scala', 'msg': msg, 'line': line, 'col': col,
+                'beg': 0, 'end': 4}
+
+    @pytest.fixture
+    def editor(self, editor, vim):
+        vim.current.buffer.name = '/src/A.scala'
+        ids = iter(range(100, 200))
+
+        def vimeval(expr):
+            if expr == "exists('*execute')":
+                return 1
+            if expr.startswith('exists'):
+                return 0  # No Syntastic
+            if expr.startswith('[exists'):
+                return [0, 10, 20]  # No Syntastic, lines in view
+            return [next(ids) for _ in range(expr.count('matchadd'))]
+
+        vim.eval.side_effect = vimeval
+        return editor
+
+    def test_adds_all_matches_in_one_call(self, editor, vim):
+        editor.display_notes([self.note(3, 5), self.note(7, 1)])
+
+        assert vim.eval.call_count == 2
+        assert vim.eval.call_args[0][0].count('matchadd') == 2
+        vim.command.assert_called_once_with('redraw')
+        assert editor.get_error_at((3, 6)).message == 'error'
+
+    def test_only_touches_changed_matches(self, editor, vim):
+        editor.display_notes([self.note(3, 5), self.note(7, 1)])
+        vim.reset_mock()
+
+        editor.display_notes([self.note(3, 5), self.note(9, 1, 'new')])
+
+        adds = [c for c in vim.eval.call_args_list if 'matchadd' in c[0][0]]
+        assert len(adds) == 1
+        assert '\\%9l' in adds[0][0][0]
+        assert vim.command.call_args_list == [
+            call("call execute(['silent! call matchdelete(101)', 'redraw'])"),
+        ]
+        assert editor.get_error_at((7, 1)) is None
+        assert editor.get_error_at((9, 1)).message == 'new'
+
+    def test_unchanged_notes_do_not_redraw(self, editor, vim):
+        editor.display_notes([self.note(3, 5)])
+        vim.reset_mock()
+
+        editor.display_notes([self.note(3, 5)])
+
+        assert not vim.command.called
+
+    def test_highlights_notes_in_view_first(self, editor, vim):
+        notes = [self.note(line, 1) for line in (1, 15, 30, 12)]
+        left = editor.highlight_notes(notes, budget=0, chunk=2)
+
+        added = vim.eval.call_args_list[-1][0][0]
+        assert '\\%15l' in added and '\\%12l' in added
+        assert [n['line'] for n in left] == [1, 30]
+        assert editor.get_error_at((15, 1)) is not None
+        vim.command.assert_called_once_with('redraw')
+
+    def test_shows_error_under_cursor_after_cd(self, editor, vim, tmpdir, monkeypatch):
+        editor.display_notes([self.note(3, 5)])
+        vim.current.window.cursor = (3, 6)
+        vim.current.window.width = 80
+        monkeypatch.chdir(str(tmpdir))
+        vim.reset_mock()
+
+        # As from expand('<afile>'), relative to Vim's cwd
+        editor.lazy_display_error('A.scala')
+        vim.command.assert_called_once_with('echo "error"')
+
+    def test_full_rendering_replaces_progress(self, editor, vim):
+        editor.highlight_notes([self.note(3, 5), self.note(7, 1)], budget=1)
+        vim.reset_mock()
+
+        editor.display_notes([self.note(3, 5)])
+
+        assert not [c for c in vim.eval.call_args_list if 'matchadd' in c[0][0]]
+        assert vim.command.call_args_list == [
+            call("call execute(['silent! call matchdelete(101)', 'redraw'])"),
+        ]
+
+
+class TestNeovimHighlights:
+    note = staticmethod(TestDisplayNotes.note)
+
+    @pytest.fixture
+    def editor(self, editor, vim):
+        editor._isneovim = True
+        vim.current.buffer.name = '/src/A.scala'
+        vim.eval.side_effect = lambda expr: 0  # No Syntastic
+        vim.api.create_namespace.return_value = 7
+        vim.api.call_atomic.return_value = [[], None]
+        return editor
+
+    def test_adds_highlights_in_namespace(self, editor, vim):
+        editor.display_notes([self.note(3, 5), self.note(7, 1)])
+
+        vim.api.call_atomic.assert_called_once_with([
+            ['nvim_buf_add_highlight', [0, 7, 'EnErrorStyle', 2, 4, 9]],
+            ['nvim_buf_add_highlight', [0, 7, 'EnErrorStyle', 6, 0, 5]],
+        ])
+        assert 'matchadd' not in str(vim.mock_calls)
+
+    def test_replaces_highlights_when_some_are_gone(self, editor, vim):
+        editor.display_notes([self.note(3, 5), self.note(7, 1)])
+        vim.api.call_atomic.reset_mock()
+
+        editor.display_notes([self.note(3, 5)])
+        editor.display_notes([self.note(3, 5)])
+
+        vim.api.call_atomic.assert_called_once_with([
+            ['nvim_buf_clear_namespace', [0, 7, 0, -1]],
+            ['nvim_buf_add_highlight', [0, 7, 'EnErrorStyle', 2, 4, 9]],
+        ])
+
+    def test_shows_virtual_text(self, editor, vim):
+        editor.virtual_text = True
+        editor.display_notes([self.note(3, 5, 'type mismatch')])
+
+        calls = vim.api.call_atomic.call_args[0][0]
+        assert calls[-1] == ['nvim_buf_set_virtual_text',
+                             [0, 7, 2, [['type mismatch', 'Comment']], {}]]
+
+    def test_clears_namespace(self, editor, vim):
+        vim.current.buffer.vars = {}
+        editor.clean_errors()
+        vim.api.buf_clear_namespace.assert_called_once_with(0, 7, 0, -1)
+
+
+class TestSymbolBounds:
+    @pytest.mark.parametrize('line, col, bounds', [
+        ('val foldLeft = 1', 6, (4, 11)),
+        ('val foldLeft = 1', 4, (4, 11)),
+        ('val foldLeft = 1', 11, (4, 11)),
+        ('  xs ++= ys', 5, (5, 7)),
+        ('a+b', 1, (1, 1)),
+        ('def unary_! = this', 8, (4, 10)),
+        ('def unary_! = this', 10, (4, 10)),
+        ('x.`type`.y', 4, (2, 7)),
+        ('x.`type`.y', 2, (2, 7)),
+        ('foo(bar)', 3, (4, 6)),
+        ('foo   ', 4, (4, 4)),
+        ('', 0, (0, 0)),
+    ])
+    def test_finds_identifier(self, line, col, bounds):
+        assert symbol_bounds(line, col) == bounds
+
+    def test_leaves_cursor_alone(self, editor, vim):
+        vim.current.window.cursor = (3, 9)
+        vim.current.line = '    list.foldLeft(0)(_ + _)'
+
+        assert editor.start_end_pos() == ((3, 9), (3, 16))
+        assert not vim.command.called
+
+    def test_converts_byte_columns_of_non_ascii_lines(self, editor, vim):
+        vim.current.window.cursor = (3, 9)  # On the l, in bytes
+        vim.current.line = u'  "\xe9".foldLeft(0)'
+
+        assert editor.start_end_pos() == ((3, 7), (3, 14))
+
+
+def test_serves_contents_from_mirror(editor, vim):
+    mirrors = BufferMirrors()
+    vim.current.buffer.number = 1
+    vim.current.buffer.api.attach.return_value = True
+    editor.mirrors = mirrors
+    editor.attach_buffer()
+    mirrors.on_lines(1, 0, -1, ['object A {', '}'])
+    vim.reset_mock()
+
+    assert editor.get_file_content() == 'object A {\n}'
+    assert editor.getlines() == ['object A {', '}']
+    assert editor.line_index().offset(2, 0) == 11
+    assert not vim.eval.called
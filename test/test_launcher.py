@@ -0,0 +1,121 @@
+# coding: utf-8
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from ensime_shared.launcher import ClasspathBootstrap, EnsimeLauncher
+
+
+def run(script):
+    output = []
+    done = threading.Event()
+    codes = []
+
+    def on_done(returncode):
+        codes.append(returncode)
+        done.set()
+
+    bootstrap = ClasspathBootstrap(
+        [sys.executable, '-c', script], '.', output.append, on_done)
+    bootstrap.start()
+    assert done.wait(10)
+    assert not bootstrap.running
+    return output, codes[0]
+
+
+class TestClasspathBootstrap:
+    def test_streams_output_then_reports_status(self):
+        output, returncode = run('print("resolving"); print("done")')
+        assert output == ['resolving', 'done']
+        assert returncode == 0
+
+    def test_reports_failure(self):
+        output, returncode = run('import sys; sys.exit(3)')
+        assert output == []
+        assert returncode == 3
+
+
+SERVER = '''
+import os, socket, sys, time
+s = socket.socket()
+s.bind(("127.0.0.1", 0))
+s.listen(1)
+with open(os.path.join(sys.argv[1], "http"), "w") as f:
+    f.write(str(s.getsockname()[1]))
+time.sleep(30)
+'''
+
+
+@pytest.fixture(params=['project', 'projé'])
+def project(request, tmpdir):
+    root = tmpdir.join(request.param)  # Bytes on Python 2
+    cache_dir = root.join('cache')
+    cache_dir.ensure(dir=True)
+    config = root.join('.ensime')
+    with open(str(config), 'w') as f:
+        f.write('(:scala-version "2.11.8" :cache-dir "{}")'.format(str(cache_dir)))
+    return config, cache_dir
+
+
+@pytest.fixture
+def server(project):
+    config, cache_dir = project
+    process = subprocess.Popen([
+        sys.executable, '-c', SERVER, str(cache_dir),
+        '-Densime.config={}'.format(str(config))])
+    cache_dir.join('server.pid').write(str(process.pid))
+    yield process
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc'), reason='needs /proc')
+class TestAttach:
+    def launcher(self, config, tmpdir):
+        return EnsimeLauncher(None, str(config), False, base_dir=str(tmpdir))
+
+    def test_attaches_to_running_server(self, project, server, tmpdir):
+        config, cache_dir = project
+        while not cache_dir.join('http').check():
+            assert server.poll() is None
+            time.sleep(0.01)
+
+        process = self.launcher(config, tmpdir).attach()
+        assert process.pid == server.pid
+        assert process.is_running()
+
+    def test_ignores_process_of_another_project(self, project, server, tmpdir):
+        config, _ = project
+        other = tmpdir.join('other.ensime')
+        config.copy(other)
+        assert self.launcher(other, tmpdir).attach() is None
+
+    def test_ignores_dead_process(self, project, server, tmpdir):
+        config, _ = project
+        server.kill()
+        server.wait()
+        assert self.launcher(config, tmpdir).attach() is None
+
+    def test_profiles_startup_once_attached(self, project, server, tmpdir):
+        config, cache_dir = project
+        while not cache_dir.join('http').check():
+            time.sleep(0.01)
+
+        launcher = self.launcher(config, tmpdir)
+        assert not cache_dir.join('ensime-vim-startup.json').check()
+        launcher.launch()
+        assert [phase for phase, _ in launcher.profile.phases] == ['config', 'attach']
+        assert cache_dir.join('ensime-vim-startup.json').check()
+
+    def test_no_profile_without_server(self, project, server, tmpdir):
+        config, cache_dir = project
+        server.kill()
+        server.wait()
+        assert self.launcher(config, tmpdir).launch() is None
+        assert not cache_dir.join('ensime-vim-startup.json').check()
@@ -0,0 +1,62 @@
+# coding: utf-8
+
+from threading import Timer
+
+from ensime_shared.pending import Generations, PendingCalls
+
+
+def test_resolves_awaited_calls():
+    pending = PendingCalls()
+    call = pending.expect(3)
+
+    assert 3 in pending
+    assert pending.resolve(3, {'callId': 3})
+    assert call.done()
+    assert call.response == {'callId': 3}
+
+
+def test_ignores_unrelated_responses():
+    pending = PendingCalls()
+    pending.expect(3)
+
+    assert not pending.resolve(4, {'callId': 4})
+    assert not pending.resolve(None, {'typehint': 'IndexerReadyEvent'})
+
+
+def test_wakes_waiter_when_response_arrives():
+    pending = PendingCalls()
+    call = pending.expect(1)
+    Timer(0.01, pending.resolve, [1, {'callId': 1}]).start()
+
+    assert call.wait(timeout=2)
+
+
+def test_late_responses_are_not_claimed():
+    pending = PendingCalls()
+    call = pending.expect(1)
+    assert not call.wait(timeout=0.001)
+
+    assert pending.discard(1) is call
+    assert not pending.resolve(1, {'callId': 1})
+    assert 1 not in pending
+
+
+def test_newer_calls_supersede_unanswered_ones_of_their_kind():
+    generations = Generations(['CompletionsReq'])
+    generations.started('CompletionsReq', 1)
+    generations.started('TypecheckFileReq', 2)
+    generations.started('CompletionsReq', 3)
+
+    assert generations.answered(1)
+    assert not generations.answered(1)  # Dropped only once
+    assert not generations.answered(2)
+    assert not generations.answered(3)
+
+
+def test_answered_calls_are_not_superseded():
+    generations = Generations(['CompletionsReq'])
+    generations.started('CompletionsReq', 1)
+    assert not generations.answered(1)
+
+    generations.started('CompletionsReq', 2)
+    assert not generations.answered(2)
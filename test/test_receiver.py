@@ -0,0 +1,103 @@
+# coding: utf-8
+
+import socket
+import time
+
+import pytest
+
+from ensime_shared.receiver import WebsocketReceiver
+
+
+class FakeWebsocket(object):
+    """Just enough of ``websocket.WebSocket`` over a plain socket."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def recv(self):
+        data = self.sock.recv(1024)
+        if not data:
+            raise IOError('connection closed')
+        return data
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.001)
+    return predicate()
+
+
+@pytest.fixture
+def receiver():
+    r = WebsocketReceiver()
+    yield r
+    r.shutdown()
+
+
+@pytest.fixture
+def sockets():
+    ours, theirs = socket.socketpair()
+    yield FakeWebsocket(ours), theirs
+    ours.close()
+    theirs.close()
+
+
+def test_delivers_frames_as_they_arrive(receiver, sockets):
+    ws, server = sockets
+    received, errors = [], []
+    receiver.register(ws, received.append, errors.append)
+
+    server.send(b'{"callId": 1}')
+    assert wait_for(lambda: received)
+    assert received == [b'{"callId": 1}']
+    assert errors == []
+
+
+def test_reports_errors_and_stops_watching(receiver, sockets):
+    ws, server = sockets
+    errors = []
+    receiver.register(ws, lambda m: None, errors.append)
+
+    server.close()
+    assert wait_for(lambda: errors)
+    assert not receiver._is_watched(ws.fileno(), ws)
+
+
+def test_shutdown_wakes_up_thread(sockets):
+    ws, _ = sockets
+    r = WebsocketReceiver()
+    r.register(ws, lambda m: None, lambda e: None)
+
+    r.shutdown()
+    assert wait_for(lambda: not r._thread.is_alive())
+    assert not r.running
+
+
+def test_ignores_errors_of_sockets_closed_while_selecting(receiver, sockets):
+    ws, _ = sockets
+    errors = []
+    receiver.register(ws, lambda m: None, errors.append)
+    # As seen by the thread before the client unregistered and closed it
+    watched = dict(receiver._sockets)
+    receiver.unregister(ws)
+    ws.sock.close()
+
+    receiver._prune(watched)
+    assert errors == []
+
+
+def test_prunes_sockets_closed_while_watched(receiver, sockets):
+    ws, _ = sockets
+    errors = []
+    receiver.register(ws, lambda m: None, errors.append)
+    watched = dict(receiver._sockets)
+    fd = ws.fileno()
+    ws.sock.close()
+
+    receiver._prune(watched)
+    assert len(errors) == 1
+    assert not receiver._is_watched(fd, ws)
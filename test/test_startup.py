@@ -0,0 +1,61 @@
+# coding: utf-8
+
+import pytest
+
+from ensime_shared.startup import describe, StartupProfile
+
+
+@pytest.fixture
+def profile(tmpdir, mocker):
+    clock = mocker.patch('ensime_shared.startup.time')
+    clock.time.return_value = 100.0
+    profile = StartupProfile(str(tmpdir.join('startup.json')))
+    profile.start()
+    profile.clock = clock.time
+    return profile
+
+
+class TestStartupProfile:
+    def test_times_phases_from_the_start(self, profile):
+        profile.clock.return_value = 101.5
+        profile.mark('config')
+        profile.clock.return_value = 104.0
+        profile.mark('spawn')
+        profile.mark('config')
+
+        assert profile.runs() == [
+            {'started': 100.0, 'phases': [['config', 1.5], ['spawn', 4.0]]}]
+
+    def test_done_once_analyzer_and_indexer_are_ready(self, profile):
+        profile.mark('analyzer')
+        assert not profile.done
+        profile.mark('indexer')
+        assert profile.done
+
+        profile.mark('connect')
+        assert [phase for phase, _ in profile.phases] == ['analyzer', 'indexer']
+
+    def test_records_nothing_until_started(self, tmpdir):
+        profile = StartupProfile(str(tmpdir.join('startup.json')))
+        profile.mark('config')
+        assert profile.phases == []
+        assert not tmpdir.join('startup.json').check()
+
+    def test_keeps_recent_startups(self, profile):
+        profile.keep = 2
+        for started in (200.0, 300.0, 400.0):
+            profile.start(started)
+            profile.mark('config')
+
+        assert [run['started'] for run in profile.runs()] == [300.0, 400.0]
+
+    def test_no_startups_recorded(self, tmpdir):
+        assert StartupProfile(str(tmpdir.join('missing.json'))).runs() == []
+
+
+def test_describe():
+    run = {'started': 100.0, 'phases': [['config', 0.5], ['spawn', 2.0]]}
+    assert describe(run) == [
+        '   0.50s   +0.50s  Project config parsed',
+        '   2.00s   +1.50s  JVM spawned',
+    ]
@@ -0,0 +1,75 @@
+# coding: utf-8
+
+import os
+
+import pytest
+from mock import Mock
+
+from ensime_shared.supervisor import resource_usage, Supervisor
+
+
+def server(pid=None, aborted=False):
+    return Mock(pid=pid, **{'aborted.return_value': aborted})
+
+
+@pytest.fixture
+def supervisor():
+    supervisor = Supervisor(server(), Mock(), Mock(), Mock(), Mock())
+    supervisor.backoff = 0.001
+    return supervisor
+
+
+class TestSupervisor:
+    def test_restarts_dead_server(self, supervisor):
+        restarted = server()
+        supervisor.launch.return_value = restarted
+        supervisor.process.aborted.return_value = True
+
+        assert supervisor.check()
+        supervisor.on_crash.assert_called_once_with(1, 0.001)
+        supervisor.on_restart.assert_called_once_with(restarted)
+        assert supervisor.process is restarted
+        assert supervisor.stats()['restarts'] == 1
+
+    def test_backs_off_then_gives_up(self, supervisor):
+        supervisor.max_restarts = 2
+        supervisor.launch.side_effect = lambda: server(aborted=True)
+        supervisor.process.aborted.return_value = True
+
+        assert supervisor.check()
+        assert supervisor.check()
+        assert not supervisor.check()
+        delays = [args[1] for args, _ in supervisor.on_crash.call_args_list]
+        assert delays == [0.001, 0.002]
+        supervisor.on_give_up.assert_called_once_with()
+        assert not supervisor.active
+
+    def test_gives_up_if_server_cannot_be_launched(self, supervisor):
+        supervisor.launch.return_value = None
+        supervisor.process.aborted.return_value = True
+
+        assert not supervisor.check()
+        supervisor.on_give_up.assert_called_once_with()
+        assert not supervisor.on_restart.called
+
+    def test_leaves_stopped_server_alone(self, supervisor):
+        supervisor.stop()
+        supervisor.process.aborted.return_value = True
+        assert not supervisor.check()
+        assert not supervisor.launch.called
+
+    @pytest.mark.skipif(not os.path.isdir('/proc'), reason='needs /proc')
+    def test_samples_resources(self, supervisor):
+        supervisor.process.pid = os.getpid()
+        supervisor.check()
+        sum(range(10 ** 6))
+        supervisor.check()
+
+        stats = supervisor.stats()
+        assert stats['rss'] > 0
+        assert stats['cpu'] >= 0
+        assert stats['cpu_time'] > 0
+
+
+def test_resource_usage_of_missing_process():
+    assert resource_usage(-1) is None
@@ -0,0 +1,112 @@
+# coding: utf-8
+
+import threading
+import time
+
+import pytest
+
+asyncio = pytest.importorskip('asyncio')
+futures = pytest.importorskip('concurrent.futures')
+websockets = pytest.importorskip('websockets')
+
+from ensime_shared.transport import AsyncioEngine  # noqa: E402
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.001)
+    return predicate()
+
+
+def echo(ws):
+    """Server handler sending back every frame, until the client leaves."""
+    done = asyncio.get_event_loop().create_future()
+
+    def receive():
+        asyncio.ensure_future(ws.recv()).add_done_callback(received)
+
+    def received(task):
+        if task.exception():
+            done.set_result(None)
+            return
+        asyncio.ensure_future(ws.send(task.result()))
+        receive()
+
+    receive()
+    return done
+
+
+@pytest.fixture
+def engine():
+    return AsyncioEngine()
+
+
+@pytest.fixture
+def serve(engine):
+    """Start a websocket server on the engine's loop, returning its URL."""
+    def serve(handler):
+        # The server has to be created on the loop it serves from
+        started = futures.Future()
+
+        def start():
+            task = asyncio.ensure_future(websockets.serve(handler, '127.0.0.1', 0))
+            task.add_done_callback(lambda task: started.set_result(task.result()))
+
+        engine.loop.call_soon_threadsafe(start)
+        server = started.result(5)
+        servers.append(server)
+        return 'ws://127.0.0.1:{}/'.format(server.sockets[0].getsockname()[1])
+
+    servers = []
+    yield serve
+    for server in servers:
+        engine.loop.call_soon_threadsafe(server.close)
+
+
+class TestAsyncioConnection:
+    def test_sends_and_receives_in_order(self, engine, serve):
+        received, errors = [], []
+        conn = engine.connect(serve(echo), received.append, errors.append)
+        for msg in ('a', 'b', 'c'):
+            conn.send(msg)
+
+        assert wait_for(lambda: len(received) == 3)
+        assert received == ['a', 'b', 'c']
+        assert errors == []
+
+    def test_receives_frames_over_a_mebibyte(self, engine, serve):
+        big = 'x' * (2 * 2 ** 20)
+        received, errors = [], []
+        engine.connect(serve(lambda ws: ws.send(big)), received.append, errors.append)
+
+        assert wait_for(lambda: received)
+        assert len(received[0]) == len(big)
+        # Then the server hangs up
+        assert wait_for(lambda: errors)
+
+    def test_close_is_not_an_error(self, engine, serve):
+        errors = []
+        conn = engine.connect(serve(echo), lambda msg: None, errors.append)
+        conn.close()
+        time.sleep(0.05)
+
+        assert errors == []
+        with pytest.raises(IOError):
+            conn.send('late')
+
+
+class TestAsyncioEngine:
+    def test_shared_by_racing_clients(self, monkeypatch):
+        monkeypatch.setattr(AsyncioEngine, '_shared', None)
+        engines = []
+        threads = [threading.Thread(target=lambda: engines.append(AsyncioEngine.shared()))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        assert len(engines) == 8
+        assert all(engine is engines[0] for engine in engines)
+        assert engines[0].loop.is_running()
@@ -0,0 +1,109 @@
+# coding: utf-8
+
+import pytest
+from mock import Mock
+
+from ensime_shared.diagnostics import NotesCache
+from ensime_shared.typecheck import TypecheckHandler
+
+
+class Handler(TypecheckHandler):
+    typecheck_debounce = 0.5
+    schedule = None
+
+    def __init__(self):
+        super(Handler, self).__init__()
+        self.log = Mock()
+        self.editor = Mock()
+        self.editor.path.return_value = '/src/A.scala'
+        self.editor.bufnr.return_value = 1
+        self.editor.getlines.side_effect = lambda bufnr: ['buffer {}'.format(bufnr)]
+        self.requests = []
+
+    def send_request(self, request):
+        self.requests.append(request)
+
+    def cache_notes(self):
+        pass
+
+
+@pytest.fixture
+def handler():
+    return Handler()
+
+
+@pytest.fixture
+def clock(mocker):
+    clock = mocker.patch('ensime_shared.typecheck.time')
+    clock.time.return_value = 100.0
+    return clock.time
+
+
+class TestTypecheckAsYouType:
+    def test_waits_for_edits_to_settle(self, handler, clock):
+        handler.on_text_changed('A.scala')
+        clock.return_value = 100.4
+        handler.typecheck_if_due()
+        assert handler.requests == []
+
+        clock.return_value = 100.5
+        handler.typecheck_if_due()
+        assert handler.requests == [{
+            "typehint": "TypecheckFilesReq",
+            "files": [{"file": '/src/A.scala', "contents": 'buffer 1'}],
+        }]
+
+    def test_coalesces_edits_to_several_buffers(self, handler, clock):
+        handler.on_text_changed('A.scala')
+        handler.on_text_changed('A.scala')
+        handler.editor.path.return_value = '/src/B.scala'
+        handler.editor.bufnr.return_value = 2
+        handler.on_text_changed('B.scala')
+
+        clock.return_value = 101.0
+        handler.typecheck_if_due()
+
+        assert len(handler.requests) == 1
+        files = sorted(f["file"] for f in handler.requests[0]["files"])
+        assert files == ['/src/A.scala', '/src/B.scala']
+
+    def test_holds_edits_back_while_running(self, handler, clock):
+        handler.on_text_changed('A.scala')
+        clock.return_value = 101.0
+        handler.typecheck_if_due()
+        handler.on_text_changed('A.scala')
+        clock.return_value = 102.0
+        handler.typecheck_if_due()
+        assert len(handler.requests) == 1
+
+        handler.handle_typecheck_complete(None, {})
+        assert len(handler.requests) == 2
+        handler.editor.display_notes.assert_called_once_with([])
+
+    def test_disabled_by_default(self, handler, clock):
+        handler.typecheck_debounce = 0
+        handler.on_text_changed('A.scala')
+        clock.return_value = 101.0
+        handler.typecheck_if_due()
+
+        assert handler.requests == []
+
+
+class TestBufferNotes:
+    note = {'file': '/src/A.scala', 'line': 3, 'col': 5}
+
+    def test_shows_notes_of_entered_buffer_after_cd(self, handler, tmpdir, monkeypatch):
+        handler.project_notes.add([self.note])
+        monkeypatch.chdir(str(tmpdir))
+
+        handler.show_buffer_notes()
+        handler.editor.display_notes.assert_called_once_with([self.note])
+
+    def test_shows_cached_notes_after_cd(self, handler, tmpdir, monkeypatch):
+        handler.notes_cache = NotesCache(str(tmpdir.join('notes.json')))
+        handler.notes_cache.update('/src/A.scala', 'abc', [self.note])
+        handler.editor.snapshot.return_value.digest = 'abc'
+        monkeypatch.chdir(str(tmpdir))
+
+        handler.show_buffer_notes()
+        handler.editor.display_notes.assert_called_once_with([self.note])
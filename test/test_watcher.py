@@ -0,0 +1,82 @@
+# coding: utf-8
+
+import os
+import threading
+
+import pytest
+
+from ensime_shared.watcher import _libc, InotifyChanges, PollingChanges, ReadinessWatcher
+
+
+@pytest.fixture(params=['inotify', 'polling'])
+def watcher(request, tmpdir, monkeypatch):
+    if request.param == 'polling':
+        monkeypatch.setattr('ensime_shared.watcher._libc', lambda: None)
+        monkeypatch.setattr(PollingChanges, 'interval', 0.01)
+    elif not _libc():
+        pytest.skip('inotify is not available')
+
+    ready = threading.Event()
+    probes = []
+
+    def probe():
+        probes.append(tmpdir.join('http').read())
+        return probes[-1] == '8080'
+
+    watcher = ReadinessWatcher(str(tmpdir), probe, ready.set)
+    watcher.probe_interval = 0.01
+    watcher.ready = ready
+    watcher.probes = probes
+    return watcher
+
+
+class TestReadinessWatcher:
+    def test_fires_once_the_port_file_is_written(self, watcher, tmpdir):
+        watcher.start()
+        assert not watcher.ready.wait(0.1)
+        assert watcher.probes == []
+
+        tmpdir.join('http').write('8080')
+        assert watcher.ready.wait(5)
+        watcher.join(5)
+        assert watcher.probes[-1] == '8080'
+
+    def test_probes_again_on_changes(self, watcher, tmpdir):
+        tmpdir.join('http').write('stale')
+        watcher.start()
+        while not watcher.probes:
+            assert not watcher.ready.wait(0.01)
+        tmpdir.join('server.log').write('starting')
+        tmpdir.join('http').write('8080')
+        assert watcher.ready.wait(5)
+        assert watcher.probes[0] == 'stale'
+
+    def test_stops_with_the_server(self, tmpdir):
+        # Would be found ready right away if it were still running
+        tmpdir.join('http').write('8080')
+        ready = []
+        watcher = ReadinessWatcher(str(tmpdir), lambda: True, lambda: ready.append(True),
+                                   alive=lambda: False)
+        watcher.start()
+        watcher.join(5)
+        assert not watcher.is_alive()
+        assert ready == []
+
+    def test_non_ascii_cache_dir(self, tmpdir):
+        cache_dir = os.path.join(str(tmpdir), 'caché')  # bytes on Python 2
+        os.mkdir(cache_dir)
+        ready = threading.Event()
+        watcher = ReadinessWatcher(cache_dir, lambda: True, ready.set)
+        watcher.start()
+
+        with open(os.path.join(cache_dir, 'http'), 'w') as f:
+            f.write('8080')
+        assert ready.wait(5)
+
+    def test_falls_back_to_polling(self, tmpdir, monkeypatch):
+        def broken(*args):
+            raise ValueError('no inotify for you')
+
+        monkeypatch.setattr(InotifyChanges, '__init__', broken)
+        watcher = ReadinessWatcher(str(tmpdir), lambda: True, None)
+        assert isinstance(watcher._changes(), PollingChanges)